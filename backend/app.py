@@ -1,24 +1,32 @@
 import os
 import sqlite3
 from sqlite3 import Connection
-from typing import Tuple, Dict, Any, List, Set, Optional
+from typing import Tuple, Dict, Any, List, Set, Optional, Union, Iterator, Sequence
+from contextlib import contextmanager
 import base64
 import io
 import json
 import hashlib
+import mmap
 import time
 import random
+import secrets
 from datetime import datetime, timedelta
 
-from flask import Flask, request, jsonify, Response, send_from_directory
+from flask import Flask, request, jsonify, Response, send_from_directory, g, has_request_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import bcrypt
 import queue
 from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 import smtplib
 from email.message import EmailMessage
 import threading
 import threading
+import weakref
+import functools
+import atexit
 
 
 # Image processing
@@ -27,6 +35,7 @@ import numpy as np
 
 # Video processing
 import tempfile
+import shutil
 
 # EXIF and geolocation processing
 import piexif
@@ -41,10 +50,18 @@ try:
     import google.generativeai as genai
 except Exception:
     genai = None
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+# Fast JSON encoding (optional; falls back to the stdlib encoder)
+try:
+    import orjson
+except Exception:
+    orjson = None
+from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps
 
 
-DB_PATH = os.path.join(os.path.dirname(__file__), 'rewards_db.sqlite')
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOADS_DIR = os.path.join(BASE_DIR, 'uploads')
+os.makedirs(UPLOADS_DIR, exist_ok=True)
+DB_PATH = os.path.join(BASE_DIR, 'rewards_db.sqlite')
 POINTS_PER_DETECTION = 100
 NON_RECYCLABLE_FLAT_POINTS = 50
 
@@ -106,11 +123,26 @@ if GEMINI_API_KEY and genai is not None:
 GEMINI_AVAILABLE = bool(GEMINI_API_KEY and genai is not None)
 
 
-def generate_image_hash(image_bytes: bytes) -> str:
+def _update_hash_from_file(hasher: Any, path: str) -> None:
+	"""
+	Feed a file's contents into a hashlib object through a read-only mmap (no full copy in Python memory)
+	"""
+	with open(path, 'rb') as f:
+		if os.fstat(f.fileno()).st_size == 0:
+			return
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+			hasher.update(mm)
+
+
+def generate_image_hash(image: Union[bytes, str]) -> str:
 	"""
-	Generate a SHA-256 hash of the image bytes for duplicate detection
+	Generate a SHA-256 hash for duplicate detection from raw image bytes or a path to a saved file
 	"""
-	return hashlib.sha256(image_bytes).hexdigest()
+	if isinstance(image, (bytes, bytearray, memoryview)):
+		return hashlib.sha256(image).hexdigest()
+	hasher = hashlib.sha256()
+	_update_hash_from_file(hasher, image)
+	return hasher.hexdigest()
 
 
 def extract_gps_from_image(image_bytes: bytes) -> tuple:
@@ -240,7 +272,11 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
 		return float('inf')
 
 
-def extract_keyframes_from_video(video_bytes: bytes) -> List[np.ndarray]:
+# Small pool for OpenCV work that releases the GIL (JPEG encodes); kept apart from the slow Gemini pool
+_cv_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cv')
+
+
+def extract_keyframes_from_video(video_bytes: bytes) -> List[bytes]:
 	"""
 	Intelligently extract 5 optimal frames from videos of any length (2-6 seconds)
 	Adaptive algorithm that finds the best frames for waste disposal verification:
@@ -249,6 +285,7 @@ def extract_keyframes_from_video(video_bytes: bytes) -> List[np.ndarray]:
 	- F3: Peak disposal action frame (highest motion/change)
 	- F4: Post-disposal verification frame
 	- F5: Final result frame (waste item in bin)
+	Frames are returned JPEG-encoded so callers can hash and upload them without holding decoded arrays.
 	"""
 	try:
 		# Create temporary file for video processing
@@ -413,8 +450,9 @@ def extract_keyframes_from_video(video_bytes: bytes) -> List[np.ndarray]:
 		# Clean up temporary file
 		os.unlink(temp_video_path)
 		
-		# Return quality-checked frames in order: F1, F2, F3, F4, F5
-		return quality_checked_frames
+		# Return quality-checked frames in order: F1, F2, F3, F4, F5, JPEG-encoded once
+		# cv2.imencode releases the GIL, so the five encodes run side by side
+		return list(_cv_executor.map(lambda frame: cv2.imencode('.jpg', frame)[1].tobytes(), quality_checked_frames))
 		
 	except Exception as e:
 		# Clean up temporary file if it exists
@@ -423,7 +461,7 @@ def extract_keyframes_from_video(video_bytes: bytes) -> List[np.ndarray]:
 		raise Exception(f"Video processing failed: {str(e)}")
 
 
-def analyze_video_sequence_with_gemini(frames: List[np.ndarray], max_retries: int = 2) -> Dict[str, Any]:
+def analyze_video_sequence_with_gemini(frames: List[bytes], max_retries: int = 2) -> Dict[str, Any]:
 	"""
 	Analyze a sequence of 5 video frames using Gemini API for waste disposal verification
 	Includes retry mechanism for improved consistency
@@ -474,17 +512,13 @@ def analyze_video_sequence_with_gemini(frames: List[np.ndarray], max_retries: in
 	}
 
 
-def _perform_gemini_analysis(frames: List[np.ndarray]) -> Dict[str, Any]:
+def _perform_gemini_analysis(frames: List[bytes]) -> Dict[str, Any]:
 	"""
 	Perform a single Gemini analysis attempt
 	"""
 	try:
-		# Convert OpenCV frames to PIL Images
-		pil_images = []
-		for frame in frames:
-			image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-			pil_image = Image.fromarray(image_rgb)
-			pil_images.append(pil_image)
+		# Keyframes are already JPEG, so pass them as inline blobs instead of decoding to PIL for the SDK to re-encode
+		image_parts = [{"mime_type": "image/jpeg", "data": frame} for frame in frames]
 		
 		# Initialize Gemini model
 		model = genai.GenerativeModel('gemini-2.0-flash')
@@ -517,7 +551,7 @@ Respond with JSON only:
 {'waste_type': '[exact item name from F1/F2]', 'disposal_verified': [true/false], 'reasoning': '[step-by-step analysis of what you see in each frame]'}"""
 		
 		# Generate response with all 5 images
-		response = model.generate_content([prompt] + pil_images)
+		response = model.generate_content([prompt] + image_parts)
 		
 		# Debug logging
 		print(f"Gemini API Response: {response.text if response and response.text else 'No response'}")
@@ -555,7 +589,7 @@ Respond with JSON only:
 			}
 		
 		try:
-			result = json.loads(json_text)
+			result = _json_loads(json_text)
 		except json.JSONDecodeError:
 			return {
 				"waste_type": "unknown",
@@ -711,7 +745,7 @@ def analyze_with_gemini(image: np.ndarray) -> Dict[str, Any]:
 			}
 		
 		try:
-			result = json.loads(json_text)
+			result = _json_loads(json_text)
 		except json.JSONDecodeError:
 			return {
 				"items": [],
@@ -776,9 +810,10 @@ def categorize_gemini_items(gemini_result: Dict[str, Any]) -> Dict[str, List[Dic
 # --------------------------
 # Carbon estimation helpers
 # --------------------------
+@functools.lru_cache(maxsize=1)
 def _load_emission_factors() -> Dict[str, float]:
-    """Load emission factors in kg per item for coarse categories."""
-    factors_path = os.path.join(os.path.dirname(__file__), 'emission_factors.json')
+    """Load emission factors in kg per item for coarse categories (read once; call cache_clear() to reload)."""
+    factors_path = os.path.join(BASE_DIR, 'emission_factors.json')
     # Conservatively small, realistic per-item savings estimates
     default_factors: Dict[str, float] = {"plastic": 0.05, "paper": 0.02, "metal": 0.15}
     try:
@@ -792,35 +827,114 @@ def _load_emission_factors() -> Dict[str, float]:
     return default_factors
 
 
+# Plastics (include common polymers and items)
+_PLASTIC_KEYWORDS = [
+    'plastic', 'pet', 'hdpe', 'ldpe', 'pp', 'polystyrene', 'ps', 'polyethylene', 'bottle', 'wrapper', 'bag',
+    'container', 'packaging', 'tetra pak'
+]
+# Paper/cardboard
+_PAPER_KEYWORDS = ['paper', 'cardboard', 'carton', 'newspaper', 'magazine', 'tissue', 'paperboard']
+# Metals (aluminum/steel cans, foil)
+_METAL_KEYWORDS = ['aluminum', 'aluminium', 'metal', 'tin', 'steel', 'can', 'foil']
+
+# One compiled alternation per category; plain substring matching, same as `k in text`
+_CARBON_CATEGORY_PATTERNS = [
+    (category, re.compile('|'.join(re.escape(k) for k in keywords)))
+    for category, keywords in (('plastic', _PLASTIC_KEYWORDS), ('paper', _PAPER_KEYWORDS), ('metal', _METAL_KEYWORDS))
+]
+
+
 def _infer_carbon_category_from_text(text: str) -> Optional[str]:
     """Infer coarse carbon category (plastic, paper, metal) from free text."""
     t = (text or '').lower()
     if not t:
         return None
-    # Plastics (include common polymers and items)
-    plastic_keywords = [
-        'plastic', 'pet', 'hdpe', 'ldpe', 'pp', 'polystyrene', 'ps', 'polyethylene', 'bottle', 'wrapper', 'bag',
-        'container', 'packaging', 'tetra pak'
-    ]
-    # Paper/cardboard
-    paper_keywords = ['paper', 'cardboard', 'carton', 'newspaper', 'magazine', 'tissue', 'paperboard']
-    # Metals (aluminum/steel cans, foil)
-    metal_keywords = ['aluminum', 'aluminium', 'metal', 'tin', 'steel', 'can', 'foil']
-    if any(k in t for k in plastic_keywords):
-        return 'plastic'
-    if any(k in t for k in paper_keywords):
-        return 'paper'
-    if any(k in t for k in metal_keywords):
-        return 'metal'
+    for category, pattern in _CARBON_CATEGORY_PATTERNS:
+        if pattern.search(t):
+            return category
     return None
 
 
-def get_db_connection() -> Connection:
-	conn = sqlite3.connect(DB_PATH)
+# Video validation: Gemini waste types that are really hands/bins, and reasoning words that describe a disposal.
+# Compiled once as substring alternations (same matching as `k in text`)
+_INVALID_VIDEO_WASTE_TYPES_RE = re.compile('|'.join(re.escape(k) for k in ["hand", "hands", "dustbin", "trash", "bin", "container", "bag", "unknown"]))
+_DISPOSAL_KEYWORDS_RE = re.compile('|'.join(re.escape(k) for k in ["deposited", "thrown", "placed", "disposed", "inside", "into", "bin", "dustbin", "dropped", "put"]))
+
+
+# Idle connections kept for reuse; LIFO so the most recently used (warm cache) connection is handed out first
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '16'))
+# Connections opened up front at startup so the first requests after start skip the connect + pragma cost
+DB_POOL_PREFILL = min(DB_POOL_SIZE, int(os.environ.get('DB_POOL_PREFILL', '4')))
+# Seconds a connection waits on another process's write lock (e.g. a second app instance on the same file) before SQLITE_BUSY
+DB_BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', '10'))
+# Prepared statements kept per connection; pooled connections live for the process, so hot queries are parsed once
+DB_CACHED_STATEMENTS = int(os.environ.get('DB_CACHED_STATEMENTS', '256'))
+_db_pool: 'queue.LifoQueue[Connection]' = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+# id(conn) -> (cache, key) entries evicted when that borrow ends, i.e. after its commit (see _evict_after_commit)
+_pending_evictions: Dict[int, List[Tuple[Any, Any]]] = {}
+
+
+def _open_db_connection() -> Connection:
+	conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT, check_same_thread=False, cached_statements=DB_CACHED_STATEMENTS)
 	conn.row_factory = sqlite3.Row
+	# WAL is persisted in the database file by init_db; NORMAL sync is durable in WAL mode with far fewer fsyncs
+	conn.execute('PRAGMA synchronous=NORMAL')
+	conn.execute('PRAGMA temp_store=MEMORY')
+	conn.execute('PRAGMA mmap_size=268435456')
+	conn.execute('PRAGMA cache_size=-65536')
+	# Truncate the WAL back to 64 MiB after checkpoints so long-lived pooled connections don't grow it unbounded
+	conn.execute('PRAGMA journal_size_limit=67108864')
 	return conn
 
 
+def _prefill_db_pool(count: int) -> None:
+	for _ in range(max(0, count - _db_pool.qsize())):
+		try:
+			_db_pool.put_nowait(_open_db_connection())
+		except queue.Full:
+			break
+
+
+@contextmanager
+def get_db_connection() -> Iterator[Connection]:
+	"""
+	Borrow a pooled connection for the duration of a `with` block.
+	Commits on normal exit and rolls back on error (same as `with sqlite3.connect(...)`), then returns it to the pool.
+	"""
+	try:
+		conn = _db_pool.get_nowait()
+	except queue.Empty:
+		conn = _open_db_connection()
+	try:
+		with conn:
+			yield conn
+	finally:
+		# Never hand out a connection with a transaction still open (e.g. after an early return mid-transaction)
+		if conn.in_transaction:
+			conn.rollback()
+		# Evicted only now, so a concurrent read can't re-cache the rows from before the commit
+		for cache, key in _pending_evictions.pop(id(conn), ()):
+			cache.pop(key)
+		try:
+			_db_pool.put_nowait(conn)
+		except queue.Full:
+			conn.close()
+
+
+@atexit.register
+def _close_db_pool() -> None:
+	# Close idle pooled connections on interpreter exit so the WAL is checkpointed and the -shm/-wal files released
+	while True:
+		try:
+			conn = _db_pool.get_nowait()
+		except queue.Empty:
+			break
+		try:
+			conn.close()
+		except sqlite3.Error:
+			pass
+
+
 def seed_coupons(conn: Connection) -> None:
 	cur = conn.execute('SELECT COUNT(*) FROM coupons')
 	count = int(cur.fetchone()[0])
@@ -930,6 +1044,8 @@ def ensure_curated_coupons(conn: Connection) -> None:
 
 def init_db() -> None:
 	with get_db_connection() as conn:
+		# journal_mode is sticky on the file, so switching to WAL once here covers every later connection
+		conn.execute('PRAGMA journal_mode=WAL')
 		# Create users table with new schema
 		conn.execute(
 			(
@@ -965,6 +1081,27 @@ def init_db() -> None:
 			conn.execute('ALTER TABLE users ADD COLUMN district TEXT DEFAULT "Unknown"')
 		# Ensure unique index on email (allows multiple NULLs for legacy rows)
 		conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users(email)')
+		# Normalized (trimmed, lowercased) location columns so same-city lookups can seek an index
+		norm_added = False
+		for norm_col in ('country_norm', 'state_norm', 'city_norm'):
+			if norm_col not in columns:
+				conn.execute(f'ALTER TABLE users ADD COLUMN {norm_col} TEXT')
+				norm_added = True
+		if norm_added:
+			conn.execute('UPDATE users SET country_norm = TRIM(LOWER(country)), state_norm = TRIM(LOWER(state)), city_norm = TRIM(LOWER(city))')
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_users_loc ON users(country_norm, state_norm, city_norm)')
+		# City leaderboards filter on the raw city column
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_users_city ON users(city, id)')
+		conn.execute(
+			'CREATE TRIGGER IF NOT EXISTS users_loc_norm_insert AFTER INSERT ON users BEGIN '
+			'  UPDATE users SET country_norm = TRIM(LOWER(NEW.country)), state_norm = TRIM(LOWER(NEW.state)), city_norm = TRIM(LOWER(NEW.city)) WHERE id = NEW.id; '
+			'END'
+		)
+		conn.execute(
+			'CREATE TRIGGER IF NOT EXISTS users_loc_norm_update AFTER UPDATE OF country, state, city ON users BEGIN '
+			'  UPDATE users SET country_norm = TRIM(LOWER(NEW.country)), state_norm = TRIM(LOWER(NEW.state)), city_norm = TRIM(LOWER(NEW.city)) WHERE id = NEW.id; '
+			'END'
+		)
 		conn.commit()
 		# Coupons table
 		conn.execute(
@@ -1002,6 +1139,7 @@ def init_db() -> None:
 				')'
 			)
 		)
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions(user_id, points_change)')
 		# Per-user certificate issuance table (enforce one-time issuance)
 		conn.execute(
 			(
@@ -1068,6 +1206,83 @@ def init_db() -> None:
 			conn.execute('ALTER TABLE waste_bounty ADD COLUMN before_image_url TEXT')
 		if 'after_image_url' not in columns:
 			conn.execute('ALTER TABLE waste_bounty ADD COLUMN after_image_url TEXT')
+		# Normalized location columns mirroring users.*_norm for indexed city filters
+		norm_added = False
+		for norm_col in ('country_norm', 'state_norm', 'city_norm'):
+			if norm_col not in columns:
+				conn.execute(f'ALTER TABLE waste_bounty ADD COLUMN {norm_col} TEXT')
+				norm_added = True
+		if norm_added:
+			conn.execute('UPDATE waste_bounty SET country_norm = TRIM(LOWER(country)), state_norm = TRIM(LOWER(state)), city_norm = TRIM(LOWER(city))')
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_waste_bounty_loc ON waste_bounty(status, country_norm, state_norm, city_norm)')
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_waste_bounty_status_lat ON waste_bounty(status, latitude)')
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_bounty_claimer ON waste_bounty(claimed_by_user_id)')
+		conn.execute(
+			'CREATE TRIGGER IF NOT EXISTS waste_bounty_loc_norm_insert AFTER INSERT ON waste_bounty BEGIN '
+			'  UPDATE waste_bounty SET country_norm = TRIM(LOWER(NEW.country)), state_norm = TRIM(LOWER(NEW.state)), city_norm = TRIM(LOWER(NEW.city)) WHERE id = NEW.id; '
+			'END'
+		)
+		conn.execute(
+			'CREATE TRIGGER IF NOT EXISTS waste_bounty_loc_norm_update AFTER UPDATE OF country, state, city ON waste_bounty BEGIN '
+			'  UPDATE waste_bounty SET country_norm = TRIM(LOWER(NEW.country)), state_norm = TRIM(LOWER(NEW.state)), city_norm = TRIM(LOWER(NEW.city)) WHERE id = NEW.id; '
+			'END'
+		)
+		# Keep active bounties aligned with the reporter's profile location when it changes
+		conn.execute(
+			'CREATE TRIGGER IF NOT EXISTS users_loc_propagate AFTER UPDATE OF country, state, city ON users BEGIN '
+			'  UPDATE waste_bounty SET country = NEW.country, state = NEW.state, city = NEW.city '
+			'  WHERE reporter_user_id = NEW.id AND status = "REPORTED"; '
+			'END'
+		)
+		# One-time alignment for bounties that drifted before the trigger existed
+		conn.execute(
+			'UPDATE waste_bounty '
+			'SET country = (SELECT country FROM users u WHERE u.id = reporter_user_id), '
+			'    state = (SELECT state FROM users u WHERE u.id = reporter_user_id), '
+			'    city = (SELECT city FROM users u WHERE u.id = reporter_user_id) '
+			'WHERE status = "REPORTED" '
+			'  AND EXISTS (SELECT 1 FROM users u WHERE u.id = reporter_user_id '
+			'    AND (u.country_norm <> waste_bounty.country_norm '
+			'      OR u.state_norm <> waste_bounty.state_norm '
+			'      OR u.city_norm <> waste_bounty.city_norm))'
+		)
+		# Lifetime profile counters, kept current by the triggers below instead of re-aggregating per view
+		user_columns = [column[1] for column in conn.execute('PRAGMA table_info(users)').fetchall()]
+		counters_added = False
+		for counter_col in ('lifetime_spent', 'lifetime_detections', 'lifetime_bounties'):
+			if counter_col not in user_columns:
+				conn.execute(f'ALTER TABLE users ADD COLUMN {counter_col} INTEGER NOT NULL DEFAULT 0')
+				counters_added = True
+		if counters_added:
+			conn.execute(
+				'UPDATE users SET '
+				'  lifetime_spent = (SELECT COALESCE(SUM(CASE WHEN t.points_change < 0 THEN -t.points_change ELSE 0 END), 0) FROM transactions t WHERE t.user_id = users.id), '
+				'  lifetime_detections = (SELECT COUNT(*) FROM transactions t WHERE t.user_id = users.id AND t.points_change > 0 '
+				'    AND t.reason IN ("Waste Detected", "Video Disposal Verified")), '
+				'  lifetime_bounties = (SELECT COUNT(*) FROM waste_bounty wb WHERE wb.claimed_by_user_id = users.id)'
+			)
+		conn.execute(
+			'CREATE TRIGGER IF NOT EXISTS transactions_lifetime_insert AFTER INSERT ON transactions BEGIN '
+			'  UPDATE users SET '
+			'    lifetime_spent = lifetime_spent + CASE WHEN NEW.points_change < 0 THEN -NEW.points_change ELSE 0 END, '
+			'    lifetime_detections = lifetime_detections + CASE WHEN NEW.points_change > 0 '
+			'      AND NEW.reason IN ("Waste Detected", "Video Disposal Verified") THEN 1 ELSE 0 END '
+			'  WHERE id = NEW.user_id; '
+			'END'
+		)
+		conn.execute(
+			'CREATE TRIGGER IF NOT EXISTS waste_bounty_lifetime_insert AFTER INSERT ON waste_bounty '
+			'WHEN NEW.claimed_by_user_id IS NOT NULL BEGIN '
+			'  UPDATE users SET lifetime_bounties = lifetime_bounties + 1 WHERE id = NEW.claimed_by_user_id; '
+			'END'
+		)
+		conn.execute(
+			'CREATE TRIGGER IF NOT EXISTS waste_bounty_lifetime_claim AFTER UPDATE OF claimed_by_user_id ON waste_bounty '
+			'WHEN OLD.claimed_by_user_id IS NOT NEW.claimed_by_user_id BEGIN '
+			'  UPDATE users SET lifetime_bounties = lifetime_bounties - 1 WHERE id = OLD.claimed_by_user_id; '
+			'  UPDATE users SET lifetime_bounties = lifetime_bounties + 1 WHERE id = NEW.claimed_by_user_id; '
+			'END'
+		)
 		# Bounty chat messages table for per-bounty chat
 		conn.execute(
 			'CREATE TABLE IF NOT EXISTS bounty_chat_messages ('
@@ -1085,6 +1300,8 @@ def init_db() -> None:
 			')'
 		)
 		conn.execute('CREATE INDEX IF NOT EXISTS idx_bounty_chat_bounty_id ON bounty_chat_messages(bounty_id)')
+		# Partial index over live messages only; serves the chat read in id order
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_bounty_chat_bid ON bounty_chat_messages(bounty_id, id) WHERE deleted_at IS NULL')
 		conn.commit()
 
 		# Clans core tables
@@ -1118,8 +1335,13 @@ def init_db() -> None:
 				')'
 			)
 		)
-		conn.execute('CREATE INDEX IF NOT EXISTS idx_clan_members_clan ON clan_members(clan_id)')
-		conn.execute('CREATE INDEX IF NOT EXISTS idx_clans_city ON clans(city)')
+		# UNIQUE(user_id) already indexes the per-user membership lookups; (clan_id, role) serves roster reads
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_clan_members_clan_role ON clan_members(clan_id, role)')
+		conn.execute('DROP INDEX IF EXISTS idx_clan_members_clan')
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_clans_leader ON clans(leader_user_id)')
+		# (city, created_at) serves both city lookups and the newest-first clan listing; it supersedes idx_clans_city
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_clans_city_created ON clans(city, created_at DESC)')
+		conn.execute('DROP INDEX IF EXISTS idx_clans_city')
 		conn.execute(
 			(
 				'CREATE TABLE IF NOT EXISTS clan_messages ('
@@ -1137,6 +1359,15 @@ def init_db() -> None:
 			)
 		)
 		conn.execute('CREATE INDEX IF NOT EXISTS idx_clan_messages_clan ON clan_messages(clan_id)')
+		# Live chat pages per clan, walked newest-first by id (soft-deleted rows are never listed)
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_cm_live_id ON clan_messages(clan_id, id) WHERE deleted_at IS NULL')
+		# Cascade a clan delete to its members and chat (foreign_keys stays off, so the FKs above don't)
+		conn.execute(
+			'CREATE TRIGGER IF NOT EXISTS clans_delete_cascade AFTER DELETE ON clans BEGIN '
+			'  DELETE FROM clan_members WHERE clan_id = OLD.id; '
+			'  DELETE FROM clan_messages WHERE clan_id = OLD.id; '
+			'END'
+		)
 		conn.commit()
 
 		# Clan join requests
@@ -1155,7 +1386,9 @@ def init_db() -> None:
 				')'
 			)
 		)
-		conn.execute('CREATE INDEX IF NOT EXISTS idx_clan_join_requests_clan ON clan_join_requests(clan_id)')
+		# Pending requests per clan, oldest first; supersedes idx_clan_join_requests_clan
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_cjr_clan_status ON clan_join_requests(clan_id, status, created_at)')
+		conn.execute('DROP INDEX IF EXISTS idx_clan_join_requests_clan')
 		conn.execute('CREATE INDEX IF NOT EXISTS idx_clan_join_requests_applicant ON clan_join_requests(applicant_user_id)')
 		conn.commit()
 
@@ -1184,6 +1417,9 @@ def init_db() -> None:
 		conn.execute('CREATE INDEX IF NOT EXISTS idx_cbc_clan_status ON clan_bounty_claims(clan_id, status)')
 		conn.execute('CREATE INDEX IF NOT EXISTS idx_cbc_bounty_status ON clan_bounty_claims(bounty_id, status)')
 		conn.execute('CREATE INDEX IF NOT EXISTS idx_cbc_requester ON clan_bounty_claims(requested_by_user_id)')
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_cbc_clan_bounty ON clan_bounty_claims(clan_id, bounty_id, created_at DESC)')
+		# Latest claim for (bounty, clan) when creating a claim
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_cbc_bounty_clan ON clan_bounty_claims(bounty_id, clan_id, id DESC)')
 		conn.commit()
 
 		# Friends and direct messages
@@ -1204,7 +1440,11 @@ def init_db() -> None:
 				')'
 			)
 		)
-		conn.execute('CREATE INDEX IF NOT EXISTS idx_friends_users ON friends(user_a_id, user_b_id)')
+		# UNIQUE(user_a_id, user_b_id) already indexes pair lookups
+		conn.execute('DROP INDEX IF EXISTS idx_friends_users')
+		# Per-side lookups for the (user_a_id = ? OR user_b_id = ?) friend list scan
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_friends_a ON friends(user_a_id, status)')
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_friends_b ON friends(user_b_id, status)')
 		conn.commit()
 
 		conn.execute(
@@ -1221,7 +1461,9 @@ def init_db() -> None:
 				')'
 			)
 		)
-		conn.execute('CREATE INDEX IF NOT EXISTS idx_dm_pair ON direct_messages(sender_user_id, recipient_user_id)')
+		# Each direction of a conversation is one range scan in id order; supersedes idx_dm_pair
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_dm_pair_live ON direct_messages(sender_user_id, recipient_user_id, id) WHERE deleted_at IS NULL')
+		conn.execute('DROP INDEX IF EXISTS idx_dm_pair')
 		conn.commit()
 
 		# Clean-buddy bot chat messages (per-user thread)
@@ -1263,10 +1505,9 @@ def init_db() -> None:
 		n_columns = [column[1] for column in cursor.fetchall()]
 		if 'context_bounty_id' not in n_columns:
 			conn.execute('ALTER TABLE notifications ADD COLUMN context_bounty_id INTEGER')
-			try:
-				conn.execute('CREATE INDEX IF NOT EXISTS idx_notifications_user_bounty ON notifications(user_id, context_bounty_id)')
-			except Exception:
-				pass
+		# Keeps the per-user "already notified about this bounty" probe an index seek
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_notifications_user_bounty ON notifications(user_id, context_bounty_id)')
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user_id, id DESC)')
 		conn.commit()
 
 		# Email OTP table for password reset and username change
@@ -1364,6 +1605,55 @@ def init_db() -> None:
 		conn.execute('CREATE INDEX IF NOT EXISTS idx_carbon_events_user_date ON carbon_events(user_id, created_at)')
 		conn.commit()
 
+		# Cache of Gemini cleanup verdicts keyed by SHA-256 of the submitted images
+		conn.execute(
+			(
+				'CREATE TABLE IF NOT EXISTS gemini_cache ('
+				'  hash TEXT PRIMARY KEY,'
+				'  result_json TEXT NOT NULL,'
+				'  created_at DATETIME DEFAULT CURRENT_TIMESTAMP'
+				')'
+			)
+		)
+		conn.commit()
+
+		# Materialized clan leaderboard, rebuilt periodically by refresh_clan_leaderboard
+		conn.execute(
+			(
+				'CREATE TABLE IF NOT EXISTS clan_leaderboard_cache ('
+				'  clan_id INTEGER PRIMARY KEY,'
+				'  name TEXT NOT NULL,'
+				'  city TEXT,'
+				'  points INTEGER NOT NULL DEFAULT 0,'
+				'  members_count INTEGER NOT NULL DEFAULT 0,'
+				'  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP'
+				')'
+			)
+		)
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_clb_points ON clan_leaderboard_cache(points DESC)')
+		# Top-N user leaderboard reads the index instead of sorting every user
+		conn.execute('CREATE INDEX IF NOT EXISTS idx_users_total_points ON users(total_points DESC)')
+		# Bumped on any change to the columns the user leaderboard shows; its ETag is checked before the query runs
+		stats_columns = [column[1] for column in conn.execute('PRAGMA table_info(stats)').fetchall()]
+		if 'users_version' not in stats_columns:
+			conn.execute('ALTER TABLE stats ADD COLUMN users_version INTEGER NOT NULL DEFAULT 0')
+		conn.execute(
+			'CREATE TRIGGER IF NOT EXISTS users_version_insert AFTER INSERT ON users BEGIN '
+			'  UPDATE stats SET users_version = users_version + 1 WHERE id = 1; '
+			'END'
+		)
+		conn.execute(
+			'CREATE TRIGGER IF NOT EXISTS users_version_update AFTER UPDATE OF username, total_points, city, state ON users BEGIN '
+			'  UPDATE stats SET users_version = users_version + 1 WHERE id = 1; '
+			'END'
+		)
+		conn.execute(
+			'CREATE TRIGGER IF NOT EXISTS users_version_delete AFTER DELETE ON users BEGIN '
+			'  UPDATE stats SET users_version = users_version + 1 WHERE id = 1; '
+			'END'
+		)
+		conn.commit()
+
 
 # Ensure database schema exists even when app is imported via WSGI
 try:
@@ -1372,7 +1662,39 @@ except Exception as e:
     print(f"init_db on import failed: {e}")
 
 
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; output matches the default provider's compact, sorted form."""
+
+    _OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson is not None else 0
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs.get('indent') is None:
+            try:
+                # Datetimes pass through to Flask's default hook so they keep the HTTP-date format
+                return orjson.dumps(obj, default=self.default, option=self._OPTIONS).decode('utf-8')
+            except TypeError:
+                # e.g. non-string dict keys; the stdlib encoder is more permissive
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        # jsonify() path: hand orjson's bytes straight to the response instead of decoding to str and re-encoding
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = orjson.dumps(obj, default=self.default, option=self._OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
 app = Flask(__name__)
+if orjson is not None:
+    app.json = ORJSONProvider(app)
 
 # Limit upload size (MB) to mitigate abuse; default 25MB
 try:
@@ -1388,12 +1710,11 @@ if _cors_env != '*':
 CORS(app, resources={r"/api/*": {"origins": _cors_origins}})
 
 # Serve uploaded files safely from a dedicated directory
-_uploads_dir = os.path.join(os.path.dirname(__file__), 'uploads')
-_certificates_dir = os.path.join(os.path.dirname(__file__), 'certificates')
+_certificates_dir = os.path.join(BASE_DIR, 'certificates')
 
 @app.route('/uploads/<path:filename>')
 def serve_upload(filename: str):
-    return send_from_directory(_uploads_dir, filename, as_attachment=False)
+    return send_from_directory(UPLOADS_DIR, filename, as_attachment=False)
 
 @app.route('/certificates/<path:filename>')
 def serve_certificate(filename: str):
@@ -1405,7 +1726,10 @@ def download_certificate(filename: str):
 
 # In-memory subscriber registry for SSE notification streams
 # Maps username -> set of Queue instances
-notification_subscribers: Dict[str, Set[queue.Queue]] = defaultdict(set)
+# Subscriber queues are weakly held so a stream whose cleanup was missed does not pin its queue forever
+notification_subscribers: Dict[str, 'weakref.WeakSet[queue.Queue]'] = defaultdict(weakref.WeakSet)
+# Per-stream backlog cap; a stalled client loses its oldest frames instead of growing memory without bound
+SSE_QUEUE_MAXSIZE = 256
 
 # -----------------------------
 # Background scheduler (missions rotation)
@@ -1603,6 +1927,19 @@ def _rotate_daily_weekly_missions() -> None:
     except Exception as e:
         print(f"Mission rotation error: {e}")
 
+
+def _prune_gemini_cache() -> None:
+    """Delete cached Gemini verdicts older than GEMINI_CACHE_TTL_DAYS so the table stays bounded."""
+    try:
+        with get_db_connection() as conn:
+            conn.execute(
+                'DELETE FROM gemini_cache WHERE created_at < datetime("now", ?)',
+                (f'-{GEMINI_CACHE_TTL_DAYS} days',),
+            )
+            conn.commit()
+    except Exception as e:
+        print(f"Gemini cache prune error: {e}")
+
 def _scheduler_loop() -> None:
     global _last_mission_rotation_check
     while True:
@@ -1616,9 +1953,6 @@ def _scheduler_loop() -> None:
             print(f"Scheduler loop error: {e}")
         time.sleep(300)  # sleep 5 minutes
 
-_scheduler_thread = threading.Thread(target=_scheduler_loop, daemon=True)
-_scheduler_thread.start()
-
 """
 Duplicate legacy scheduler section below consolidated by enhanced _rotate_daily_weekly_missions.
 Keeping loop code to maintain behavior while avoiding duplicate seeding logic.
@@ -1633,15 +1967,12 @@ def _scheduler_loop() -> None:
             if now - _last_mission_rotation_check > 1800:
                 with _scheduler_lock:
                     _rotate_daily_weekly_missions()
+                    _prune_gemini_cache()
                     _last_mission_rotation_check = now
         except Exception as e:
             print(f"Scheduler loop error: {e}")
         time.sleep(300)  # sleep 5 minutes between checks
 
-# Start scheduler thread
-_scheduler_thread = threading.Thread(target=_scheduler_loop, daemon=True)
-_scheduler_thread.start()
-
 
 def parse_username_from_auth() -> Optional[str]:
 	auth_header = request.headers.get('Authorization', '')
@@ -1661,6 +1992,98 @@ def parse_username_from_token_param() -> Optional[str]:
     return token.replace('token_', '', 1)
 
 
+class _TTLCache:
+    """Small thread-safe dict whose entries expire `ttl_seconds` after they are stored."""
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._data: Dict[Any, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    def pop(self, key: Any) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+# Per-user /api/stats payload; every write that feeds it also moves points and calls _invalidate_user_stats
+_user_stats_cache = _TTLCache(ttl_seconds=10)
+
+
+# Read-mostly views: weekly carbon summary per user id, and clan listings per city.
+# Writers pop the affected key; the TTL bounds anything not invalidated explicitly (e.g. a leader renaming)
+_carbon_stats_cache = _TTLCache(ttl_seconds=120)
+_city_clans_cache = _TTLCache(ttl_seconds=60)
+# (version, serialized GET /api/clan_chat body) per clan id; polled every few seconds, popped on post/delete
+_clan_chat_cache = _TTLCache(ttl_seconds=5)
+# Messages per GET /api/clan_chat page unless the client asks for another limit (max 500)
+CLAN_CHAT_PAGE_SIZE = 100
+# Serialized city CO2 leaderboard per (city, limit); shared by everyone in the city, so only the TTL expires it
+_city_co2_cache = _TTLCache(ttl_seconds=60)
+
+
+def _request_user_memo() -> Optional[Dict[Tuple[str, str], Any]]:
+    """Per-request memo of user lookups on flask.g; None outside a request (background workers)."""
+    if not has_request_context():
+        return None
+    return g.setdefault('_user_memo', {})
+
+
+def _get_user_id(conn: Connection, username: str) -> Optional[int]:
+    memo = _request_user_memo()
+    if memo is not None and ('id', username) in memo:
+        return memo[('id', username)]
+    # Not cached across requests: a renamed user's old name can be re-registered by someone else at any time
+    row = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
+    user_id = int(row[0]) if row is not None else None
+    if memo is not None:
+        memo[('id', username)] = user_id
+    return user_id
+
+
+def _get_user_ids(conn: Connection, names: Sequence[str]) -> Dict[str, int]:
+    """Resolve several usernames at once; names not found are absent from the result. One IN query covers every memo miss."""
+    memo = _request_user_memo()
+    ids: Dict[str, int] = {}
+    missing: List[str] = []
+    for name in dict.fromkeys(names):
+        if memo is None or ('id', name) not in memo:
+            missing.append(name)
+        elif memo[('id', name)] is not None:
+            ids[name] = memo[('id', name)]
+    if missing:
+        q = 'SELECT id, username FROM users WHERE username IN (%s)' % ','.join('?' * len(missing))
+        for r in conn.execute(q, tuple(missing)):
+            ids[r["username"]] = int(r["id"])
+    if memo is not None:
+        for name in names:
+            memo[('id', name)] = ids.get(name)
+    return ids
+
+
+def _evict_after_commit(conn: Connection, cache: _TTLCache, key: Any) -> None:
+    """Pop `key` from `cache` once conn's get_db_connection block ends (after it commits)."""
+    _pending_evictions.setdefault(id(conn), []).append((cache, key))
+
+
+def _invalidate_user_stats(conn: Connection, *user_ids: int) -> None:
+    for user_id in user_ids:
+        _evict_after_commit(conn, _user_stats_cache, int(user_id))
+
+
 def _get_user_row(conn: Connection, username: str) -> Optional[sqlite3.Row]:
     return conn.execute('SELECT id, username, total_points FROM users WHERE username = ?', (username,)).fetchone()
 
@@ -1668,12 +2091,13 @@ def _get_user_row(conn: Connection, username: str) -> Optional[sqlite3.Row]:
 def _award_points(conn: Connection, user_id: int, points: int, reason: str) -> None:
     conn.execute('UPDATE users SET total_points = total_points + ? WHERE id = ?', (points, user_id))
     conn.execute('INSERT INTO transactions (user_id, points_change, reason) VALUES (?, ?, ?)', (user_id, points, reason))
+    _invalidate_user_stats(conn, user_id)
 
 
 def _ensure_backend_dirs() -> None:
     """Ensure required backend directories exist."""
     try:
-        os.makedirs(_uploads_dir, exist_ok=True)
+        os.makedirs(UPLOADS_DIR, exist_ok=True)
     except Exception:
         pass
     try:
@@ -1745,7 +2169,7 @@ def generate_carbon_warrior_certificate(username: str, meta: Optional[Dict[str,
     )
 
     # Load assets and fonts
-    assets_dir = os.path.join(os.path.dirname(__file__), 'assets')
+    assets_dir = os.path.join(BASE_DIR, 'assets')
     sbm_path = os.path.join(assets_dir, 'swachh-bharat.png')
     vpkb_path = os.path.join(assets_dir, 'vpkbiet_logo.png')
     # Use at most two modern sans-serif fonts: bold for titles/name, regular for body
@@ -1983,6 +2407,7 @@ def redeem_certificate() -> Tuple[Any, int]:
         new_total = total_points - COST
         conn.execute('UPDATE users SET total_points = ? WHERE id = ?', (new_total, user_id))
         conn.execute('INSERT INTO transactions (user_id, points_change, reason) VALUES (?, ?, ?)', (user_id, -COST, 'Redeemed: Carbon Warrior Certificate'))
+        _invalidate_user_stats(conn, user_id)
         conn.execute('UPDATE stats SET redemptions = redemptions + 1 WHERE id = 1')
         conn.commit()
 
@@ -2040,14 +2465,80 @@ def get_my_certificate() -> Tuple[Any, int]:
         return jsonify({"certificate_url": f"/certificates/{filename}", "issued_at": row[1]}), 200
 
 
-def notify_user(recipient_username: str, payload: Dict[str, Any]) -> None:
-    """Push a notification payload to all active SSE subscribers for the user."""
+def _json_dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else None)
+        except TypeError:
+            # e.g. non-string dict keys; the stdlib encoder is more permissive
+            pass
+    return json.dumps(obj, separators=(',', ':'), sort_keys=sort_keys).encode('utf-8')
+
+
+def _json_dumps(obj: Any) -> str:
+    """_json_dumps_bytes as text, for JSON stored in TEXT columns (e.g. notifications.payload)."""
+    return _json_dumps_bytes(obj).decode('utf-8')
+
+
+def _json_loads(text: Union[str, bytes]) -> Any:
+    """Parse JSON with orjson when it is installed; both raise json.JSONDecodeError on bad input."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _iter_row_dicts(cursor: sqlite3.Cursor, keys: Tuple[str, ...]) -> Iterator[Dict[str, Any]]:
+    """Map each row of an unfetched cursor to {key: row[key]} lazily (no fetchall)."""
+    for row in cursor:
+        yield {k: row[k] for k in keys}
+
+
+def _etag(*parts: Any) -> str:
+    """Short strong ETag over version parts (ids, timestamps, limits) or a serialized body."""
+    h = hashlib.blake2s(digest_size=8)
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def _etagged_json(etag: str, body: Optional[bytes], cache_control: str = 'private, max-age=10') -> Tuple[Response, int]:
+    """304 when the client already holds `etag`, else `body` as JSON; both carry the ETag and Cache-Control."""
+    if request.if_none_match.contains(etag) or body is None:
+        resp, status = app.response_class(status=304), 304
+    else:
+        resp, status = app.response_class(body, mimetype='application/json'), 200
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = cache_control
+    return resp, status
+
+
+def _sse_frame(payload: Dict[str, Any]) -> bytes:
+    """Serialize a notification payload into a ready-to-send SSE data frame."""
+    return b'data: ' + _json_dumps_bytes(payload) + b'\n\n'
+
+
+def push_sse_frame(recipient_username: str, frame: bytes) -> None:
+    """Push an already serialized SSE frame to all active subscribers for the user."""
     try:
         subscribers = notification_subscribers.get(recipient_username, set())
         dead_queues = []
         for q in list(subscribers):
             try:
-                q.put_nowait(payload)
+                try:
+                    q.put_nowait(frame)
+                except queue.Full:
+                    # Drop the oldest pending frame to make room for the newest
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+                    try:
+                        q.put_nowait(frame)
+                    except queue.Full:
+                        # Another producer refilled it in between; drop this frame, the subscriber is still live
+                        pass
             except Exception:
                 dead_queues.append(q)
         for dq in dead_queues:
@@ -2059,6 +2550,96 @@ def notify_user(recipient_username: str, payload: Dict[str, Any]) -> None:
         print(f"notify_user error: {e}")
 
 
+def notify_user(recipient_username: str, payload: Dict[str, Any]) -> None:
+    """Push a notification payload to all active SSE subscribers for the user."""
+    if not notification_subscribers.get(recipient_username):
+        return
+    push_sse_frame(recipient_username, _sse_frame(payload))
+
+
+# Notifications that the HTTP response does not depend on are persisted and pushed by a background worker
+_notification_queue: 'queue.Queue[Dict[str, Any]]' = queue.Queue()
+
+
+def enqueue_notification(user_id: int, username: str, ntype: str, title: str, message: str,
+                         payload: Dict[str, Any], context_bounty_id: Optional[int] = None) -> None:
+    """Queue a notification row plus its live SSE push; the caller returns without waiting for either."""
+    _notification_queue.put({
+        "user_id": int(user_id),
+        "username": username,
+        "type": ntype,
+        "title": title,
+        "message": message,
+        "payload": payload,
+        "context_bounty_id": context_bounty_id,
+    })
+
+
+# A failed batch is rolled back whole and requeued; items are dropped (and logged) after this many tries
+NOTIFICATION_MAX_ATTEMPTS = 5
+
+
+def _write_notifications(batch: List[Dict[str, Any]]) -> None:
+    """Insert a batch of queued notifications in one transaction, filling in each item's id and created_at."""
+    with get_db_connection() as conn:
+        for item in batch:
+            row = conn.execute(
+                'INSERT INTO notifications (user_id, type, title, message, payload, context_bounty_id) VALUES (?, ?, ?, ?, ?, ?) RETURNING id, created_at',
+                (item["user_id"], item["type"], item["title"], item["message"], _json_dumps(item["payload"]), item["context_bounty_id"])
+            ).fetchone()
+            item["id"], item["created_at"] = row[0], row[1]
+
+
+def _notification_worker() -> None:
+    while True:
+        batch = [_notification_queue.get()]
+        # Drain whatever else is already waiting so a burst is written in one transaction
+        while len(batch) < 100:
+            try:
+                batch.append(_notification_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _write_notifications(batch)
+        except Exception as e:
+            print(f"Notification worker error: {e}")
+            attempts = 0
+            for item in batch:
+                item["attempts"] = item.get("attempts", 0) + 1
+                attempts = max(attempts, item["attempts"])
+                if item["attempts"] < NOTIFICATION_MAX_ATTEMPTS:
+                    _notification_queue.put(item)
+                else:
+                    print(f"Dropping {item['type']} notification for user {item['user_id']} after {item['attempts']} attempts")
+            # Back off before retrying (e.g. while another process holds the write lock)
+            time.sleep(min(2 ** attempts, 30))
+            continue
+        for item in batch:
+            live = {k: item[k] for k in ("id", "type", "title", "message", "payload", "created_at")}
+            if item["context_bounty_id"] is not None:
+                live["context_bounty_id"] = item["context_bounty_id"]
+            try:
+                notify_user(item["username"], live)
+            except Exception:
+                pass
+
+
+@atexit.register
+def _flush_notification_queue() -> None:
+    # Persist whatever is still queued at shutdown (no live push; the process is going away)
+    batch: List[Dict[str, Any]] = []
+    while True:
+        try:
+            batch.append(_notification_queue.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        try:
+            _write_notifications(batch)
+        except Exception as e:
+            print(f"Notification flush at exit failed, {len(batch)} dropped: {e}")
+
+
 @app.route('/api/missions/today', methods=['GET'])
 def get_today_missions():
     username = parse_username_from_auth()
@@ -2253,6 +2834,26 @@ def _generate_clean_buddy_reply(
     return f"{base} Ask me anything."
 
 
+# Daily tips depend only on city and date, so generate each one once and share it across users
+_daily_tip_cache: Dict[Tuple[str, str], str] = {}
+_daily_tip_lock = threading.Lock()
+
+
+def _get_daily_tip(user_city: Optional[str], day: str) -> str:
+    """Return the Clean-buddy daily tip for a city on the given UTC day, generating it on first request."""
+    key = ((user_city or '').strip().lower(), day)
+    with _daily_tip_lock:
+        tip = _daily_tip_cache.get(key)
+    if tip is not None:
+        return tip
+    tip = _generate_clean_buddy_reply("daily tip", user_city)
+    with _daily_tip_lock:
+        # Drop previous days' tips so the cache only ever holds today's entries
+        for stale_key in [k for k in _daily_tip_cache if k[1] != day]:
+            del _daily_tip_cache[stale_key]
+        return _daily_tip_cache.setdefault(key, tip)
+
+
 @app.route('/api/clean_buddy', methods=['GET'])
 def get_clean_buddy_chat() -> Tuple[Any, int]:
     username = parse_username_from_auth()
@@ -2343,11 +2944,10 @@ def offline_sync_uploads() -> Tuple[Any, int]:
                 if not b64:
                     continue
                 # Persist to uploads dir
-                os.makedirs(_uploads_dir, exist_ok=True)
                 raw = base64.b64decode(b64.split(',')[-1])
                 fname = it.get('filename') or f"queued_{int(time.time()*1000)}.jpg"
                 safe = ''.join(ch for ch in fname if ch.isalnum() or ch in ('-', '_', '.')) or f"file_{int(time.time())}.jpg"
-                out = os.path.join(_uploads_dir, safe)
+                out = os.path.join(UPLOADS_DIR, safe)
                 with open(out, 'wb') as fh:
                     fh.write(raw)
                 # Enqueue moderation record
@@ -2394,6 +2994,7 @@ def moderation_review() -> Tuple[Any, int]:
                     amount = round(per_item * 1, 3)
                     if amount > 0:
                         conn.execute('INSERT INTO carbon_events (user_id, category, amount_kg) VALUES (?, ?, ?)', (uid, category, amount))
+                        _evict_after_commit(conn, _carbon_stats_cache, uid)
                 except Exception:
                     pass
             conn.commit()
@@ -2663,6 +3264,7 @@ def login() -> Tuple[Any, int]:
 					if db_points < 100000:
 						conn.execute('UPDATE users SET total_points = ? WHERE id = ?', (100000, user_id))
 						conn.commit()
+						_invalidate_user_stats(conn, user_id)
 						new_total_points = 100000
 		except Exception:
 			# Do not block login if bonus application fails
@@ -3119,6 +3721,7 @@ def redeem_coupon() -> Tuple[Any, int]:
 		new_total = total_points - cost
 		conn.execute('UPDATE users SET total_points = ? WHERE id = ?', (new_total, user_id))
 		conn.execute('INSERT INTO transactions (user_id, points_change, reason) VALUES (?, ?, ?)', (user_id, -cost, f"Redeemed: {cname}"))
+		_invalidate_user_stats(conn, user_id)
 		conn.execute('UPDATE stats SET redemptions = redemptions + 1 WHERE id = 1')
 		conn.commit()
 	return jsonify({"message": "Coupon redeemed", "total_points": new_total, "coupon_code": code, "external_url": external_url}), 200
@@ -3192,18 +3795,16 @@ def create_bounty() -> Tuple[Any, int]:
 	
 	# Get user info (id and normalized location)
 	with get_db_connection() as conn:
-		row = conn.execute('SELECT id, country, state, city FROM users WHERE username = ?', (username,)).fetchone()
+		row = conn.execute('SELECT id, country, state, city, country_norm, state_norm, city_norm FROM users WHERE username = ?', (username,)).fetchone()
 		if row is None:
 			return jsonify({"error": "user not found"}), 404
 		user_id = int(row[0])
 		user_country, user_state, user_city = row[1], row[2], row[3]
+		user_loc_norm = (row[4], row[5], row[6])
 	
 	# Save image to a temporary location (in production, use cloud storage)
 	image_filename = f"bounty_{user_id}_{int(time.time())}.jpg"
-	image_path = os.path.join(os.path.dirname(__file__), 'uploads', image_filename)
-	
-	# Create uploads directory if it doesn't exist
-	os.makedirs(os.path.dirname(image_path), exist_ok=True)
+	image_path = os.path.join(UPLOADS_DIR, image_filename)
 	
 	with open(image_path, 'wb') as f:
 		f.write(file_bytes)
@@ -3220,13 +3821,21 @@ def create_bounty() -> Tuple[Any, int]:
 	# Prevent duplicate bounties for the same coordinates (within ~20m)
 	# Compare against all active bounties to avoid city name mismatches blocking duplicate detection
 	with get_db_connection() as conn:
-		rows = conn.execute(
-			'SELECT id, latitude, longitude FROM waste_bounty WHERE status = "REPORTED"'
-		).fetchall()
-		for r in rows:
-			existing_lat, existing_lon = float(r[1]), float(r[2])
-			if calculate_distance(existing_lat, existing_lon, latitude, longitude) <= 20:
-				return jsonify({"error": "Bounty is already raised for this location."}), 409
+		conn.create_function('hav', 4, calculate_distance, deterministic=True)
+		# Bounding box slightly wider than 20m narrows candidates via the index before the exact haversine check
+		lat_delta = 25.0 / 111320.0
+		lon_delta = lat_delta / max(math.cos(math.radians(latitude)), 0.01)
+		lon_min, lon_max = longitude - lon_delta, longitude + lon_delta
+		if lon_min < -180.0 or lon_max > 180.0:
+			lon_min, lon_max = -180.0, 180.0
+		duplicate = conn.execute(
+			'SELECT 1 FROM waste_bounty WHERE status = "REPORTED" '
+			'  AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ? '
+			'  AND hav(latitude, longitude, ?, ?) <= 20 LIMIT 1',
+			(latitude - lat_delta, latitude + lat_delta, lon_min, lon_max, latitude, longitude)
+		).fetchone()
+		if duplicate is not None:
+			return jsonify({"error": "Bounty is already raised for this location."}), 409
 
 	# Create bounty record - store reporter's normalized location for consistent city matching
 	with get_db_connection() as conn:
@@ -3235,13 +3844,10 @@ def create_bounty() -> Tuple[Any, int]:
 			(user_id, latitude, longitude, user_country, user_state, user_city, f"/uploads/{image_filename}")
 		)
 		bounty_id = cur.lastrowid
+		_invalidate_user_stats(conn, user_id)
 		# Award reporter for raising bounty
 		try:
-			# Fetch current points
-			u = conn.execute('SELECT total_points FROM users WHERE id = ?', (user_id,)).fetchone()
-			current_total = int(u[0]) if u else 0
-			new_total = current_total + BOUNTY_REPORTER_REWARD
-			conn.execute('UPDATE users SET total_points = ? WHERE id = ?', (new_total, user_id))
+			conn.execute('UPDATE users SET total_points = total_points + ? WHERE id = ?', (BOUNTY_REPORTER_REWARD, user_id))
 			conn.execute(
 				'INSERT INTO transactions (user_id, points_change, reason) VALUES (?, ?, ?)',
 				(user_id, BOUNTY_REPORTER_REWARD, f'Bounty Reported - Bounty #{bounty_id}')
@@ -3259,49 +3865,40 @@ def create_bounty() -> Tuple[Any, int]:
 	# Fan-out notification to users in the same city (excluding reporter)
 	try:
 		with get_db_connection() as conn:
-			rows = conn.execute(
-				'SELECT username FROM users WHERE TRIM(LOWER(country)) = TRIM(LOWER(?)) AND TRIM(LOWER(state)) = TRIM(LOWER(?)) AND TRIM(LOWER(city)) = TRIM(LOWER(?)) AND username <> ?',
-				(user_country, user_state, user_city, username)
+			recipients = conn.execute(
+				'SELECT id, username FROM users WHERE country_norm = ? AND state_norm = ? AND city_norm = ? AND username <> ?',
+				(*user_loc_norm, username)
 			).fetchall()
-			# Persist notifications and push to SSE subscribers
-			for r in rows:
-				recipient = r[0]
-				# Persist
-				user_row = conn.execute('SELECT id FROM users WHERE username = ?', (recipient,)).fetchone()
-				if user_row is None:
-					continue
-				recipient_id = int(user_row[0])
-				payload = {
-					"kind": "BOUNTY_CREATED",
-					"city": user_city,
-					"state": user_state,
-					"country": user_country,
-					"latitude": latitude,
-					"longitude": longitude,
-					"image_url": f"/uploads/{image_filename}"
-				}
-				conn.execute(
-					'INSERT INTO notifications (user_id, type, title, message, city, payload, context_bounty_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
-					(
-						recipient_id,
-						'BOUNTY_CREATED',
-						'New bounty in your city',
-						f"New waste bounty reported in {user_city}, {user_state}",
-						user_city,
-						json.dumps(payload),
-						bounty_id
-					)
-				)
-				# Push to live subscribers
-				notify_user(recipient, {
-					"id": None,
-					"type": "BOUNTY_CREATED",
-					"title": "New bounty in your city",
-					"message": f"New waste bounty reported in {user_city}, {user_state}",
-					"city": user_city,
-					"payload": payload,
-					"created_at": time.strftime('%Y-%m-%d %H:%M:%S')
-				})
+			title = 'New bounty in your city'
+			message = f"New waste bounty reported in {user_city}, {user_state}"
+			payload = {
+				"kind": "BOUNTY_CREATED",
+				"city": user_city,
+				"state": user_state,
+				"country": user_country,
+				"latitude": latitude,
+				"longitude": longitude,
+				"image_url": f"/uploads/{image_filename}"
+			}
+			payload_json = _json_dumps(payload)
+			# Persist all notifications through one prepared statement
+			conn.executemany(
+				'INSERT INTO notifications (user_id, type, title, message, city, payload, context_bounty_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+				[(int(r[0]), 'BOUNTY_CREATED', title, message, user_city, payload_json, bounty_id) for r in recipients]
+			)
+			# Push to live subscribers
+			live_event = {
+				"id": None,
+				"type": "BOUNTY_CREATED",
+				"title": title,
+				"message": message,
+				"city": user_city,
+				"payload": payload,
+				"created_at": time.strftime('%Y-%m-%d %H:%M:%S')
+			}
+			live_frame = _sse_frame(live_event)
+			for r in recipients:
+				push_sse_frame(r[1], live_frame)
 			conn.commit()
 	except Exception as e:
 		print(f"Notification fan-out error: {e}")
@@ -3329,30 +3926,14 @@ def get_bounties() -> Tuple[Any, int]:
 
     # Get user's id and location
     with get_db_connection() as conn:
-        row = conn.execute('SELECT id, country, state, city FROM users WHERE username = ?', (username,)).fetchone()
+        row = conn.execute('SELECT id, country, state, city, country_norm, state_norm, city_norm FROM users WHERE username = ?', (username,)).fetchone()
         if row is None:
             return jsonify({"error": "user not found"}), 404
         user_id, user_country, user_state, user_city = int(row[0]), row[1], row[2], row[3]
+        user_loc_norm = (row[4], row[5], row[6])
     
     # Get active bounties in user's city OR those created by the user
     with get_db_connection() as conn:
-        # Align existing active bounty locations to reporter's normalized profile location
-        try:
-            conn.execute(
-                'UPDATE waste_bounty '
-                'SET country = (SELECT country FROM users u WHERE u.id = reporter_user_id), '
-                '    state = (SELECT state FROM users u WHERE u.id = reporter_user_id), '
-                '    city = (SELECT city FROM users u WHERE u.id = reporter_user_id) '
-                'WHERE status = "REPORTED" '
-                '  AND EXISTS (SELECT 1 FROM users u WHERE u.id = reporter_user_id '
-                '    AND (TRIM(LOWER(u.country)) <> TRIM(LOWER(waste_bounty.country)) '
-                '      OR TRIM(LOWER(u.state)) <> TRIM(LOWER(waste_bounty.state)) '
-                '      OR TRIM(LOWER(u.city)) <> TRIM(LOWER(waste_bounty.city))))'
-            )
-            conn.commit()
-        except Exception as e:
-            print(f"Bounty location alignment skipped due to error: {e}")
-
         rows = conn.execute(
             'SELECT '
             '  b.id, b.latitude, b.longitude, b.country, b.state, b.city, '
@@ -3362,13 +3943,11 @@ def get_bounties() -> Tuple[Any, int]:
             'JOIN users u ON u.id = b.reporter_user_id '
             'WHERE b.status = "REPORTED" '
             '  AND ( '
-            '    (TRIM(LOWER(b.country)) = TRIM(LOWER(?)) '
-            '     AND TRIM(LOWER(b.state)) = TRIM(LOWER(?)) '
-            '     AND TRIM(LOWER(b.city)) = TRIM(LOWER(?))) '
+            '    (u.country_norm = ? AND u.state_norm = ? AND u.city_norm = ?) '
             '    OR b.reporter_user_id = ? '
             '  ) '
             'ORDER BY b.created_at DESC',
-            (user_country, user_state, user_city, user_id)
+            (*user_loc_norm, user_id)
         ).fetchall()
         print(f"Found {len(rows)} bounties for user city: {user_city}")
         
@@ -3380,11 +3959,13 @@ def get_bounties() -> Tuple[Any, int]:
             my_clan_row = conn.execute('SELECT cm.clan_id FROM clan_members cm JOIN users u ON u.id = cm.user_id WHERE u.username = ?', (username,)).fetchone()
             my_clan_id = int(my_clan_row[0]) if my_clan_row else None
             if bounty_ids and my_clan_id is not None:
-                # For each bounty, get latest claim status for this clan
+                # For each bounty, get latest claim status for this clan (ties on created_at resolve to the newest id)
                 q_marks = ','.join(['?'] * len(bounty_ids))
                 claim_rows = conn.execute(
-                    f'SELECT bounty_id, status FROM clan_bounty_claims WHERE clan_id = ? AND bounty_id IN ({q_marks}) '
-                    'GROUP BY bounty_id ORDER BY MAX(created_at) DESC',
+                    f'SELECT c.bounty_id, c.status FROM clan_bounty_claims c WHERE c.clan_id = ? AND c.bounty_id IN ({q_marks}) '
+                    '  AND c.created_at = (SELECT MAX(c2.created_at) FROM clan_bounty_claims c2 '
+                    '                      WHERE c2.clan_id = c.clan_id AND c2.bounty_id = c.bounty_id) '
+                    'ORDER BY c.id',
                     (my_clan_id, *bounty_ids)
                 ).fetchall()
                 for cr in claim_rows:
@@ -3598,7 +4179,7 @@ def list_notifications() -> Tuple[Any, int]:
         return jsonify({"error": "unauthorized"}), 401
     limit = int(request.args.get('limit', '50'))
     with get_db_connection() as conn:
-        row = conn.execute('SELECT id, country, state, city FROM users WHERE username = ?', (username,)).fetchone()
+        row = conn.execute('SELECT id, country, state, city, country_norm, state_norm, city_norm FROM users WHERE username = ?', (username,)).fetchone()
         if row is None:
             return jsonify({"error": "user not found"}), 404
         user_id = int(row[0])
@@ -3606,42 +4187,27 @@ def list_notifications() -> Tuple[Any, int]:
 
         # Backfill: ensure user has notifications for currently active bounties in their city
         try:
-            bounty_rows = conn.execute(
-                'SELECT id, latitude, longitude FROM waste_bounty '
-                'WHERE status = "REPORTED" '
-                '  AND TRIM(LOWER(country)) = TRIM(LOWER(?)) '
-                '  AND TRIM(LOWER(state)) = TRIM(LOWER(?)) '
-                '  AND TRIM(LOWER(city)) = TRIM(LOWER(?)) '
-                '  AND reporter_user_id <> ?',
-                (user_country, user_state, user_city, user_id)
-            ).fetchall()
-            for b in bounty_rows:
-                b_id = int(b[0])
-                exists = conn.execute(
-                    'SELECT 1 FROM notifications WHERE user_id = ? AND context_bounty_id = ? LIMIT 1',
-                    (user_id, b_id)
-                ).fetchone()
-                if exists is None:
-                    payload = {
-                        "kind": "BOUNTY_CREATED",
-                        "city": user_city,
-                        "state": user_state,
-                        "country": user_country,
-                        "latitude": float(b[1]),
-                        "longitude": float(b[2])
-                    }
-                    conn.execute(
-                        'INSERT INTO notifications (user_id, type, title, message, city, payload, context_bounty_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
-                        (
-                            user_id,
-                            'BOUNTY_CREATED',
-                            'New bounty in your city',
-                            f'New waste bounty reported in {user_city}, {user_state}',
-                            user_city,
-                            json.dumps(payload),
-                            b_id
-                        )
-                    )
+            conn.execute(
+                'INSERT INTO notifications (user_id, type, title, message, city, payload, context_bounty_id) '
+                "SELECT ?, 'BOUNTY_CREATED', 'New bounty in your city', ?, ?, "
+                "       json_object('kind', 'BOUNTY_CREATED', 'city', ?, 'state', ?, 'country', ?, "
+                "                   'latitude', CAST(b.latitude AS REAL), 'longitude', CAST(b.longitude AS REAL)), "
+                '       b.id '
+                'FROM waste_bounty b '
+                'WHERE b.status = "REPORTED" '
+                '  AND b.country_norm = ? AND b.state_norm = ? AND b.city_norm = ? '
+                '  AND b.reporter_user_id <> ? '
+                '  AND NOT EXISTS (SELECT 1 FROM notifications n WHERE n.user_id = ? AND n.context_bounty_id = b.id)',
+                (
+                    user_id,
+                    f'New waste bounty reported in {user_city}, {user_state}',
+                    user_city,
+                    user_city, user_state, user_country,
+                    row[4], row[5], row[6],
+                    user_id,
+                    user_id
+                )
+            )
             conn.commit()
         except Exception as e:
             print(f"Backfill notifications error for {username}: {e}")
@@ -3655,10 +4221,10 @@ def list_notifications() -> Tuple[Any, int]:
                 (uid_int, today)
             ).fetchone()
             if exists_tip is None:
-                tip_text = _generate_clean_buddy_reply("daily tip", user_city)
+                tip_text = _get_daily_tip(user_city, today)
                 conn.execute(
                     'INSERT INTO notifications (user_id, type, title, message, city, payload) VALUES (?, ?, ?, ?, ?, ?)',
-                    (uid_int, 'SMART_TIP', 'Clean-buddy Tip', tip_text, user_city, json.dumps({"source": "clean-buddy"}))
+                    (uid_int, 'SMART_TIP', 'Clean-buddy Tip', tip_text, user_city, _json_dumps({"source": "clean-buddy"}))
                 )
                 conn.commit()
         except Exception as _e:
@@ -3727,17 +4293,20 @@ def notifications_stream():
     except Exception:
         return jsonify({"error": "unauthorized"}), 401
 
-    q: queue.Queue = queue.Queue()
+    q: queue.Queue = queue.Queue(maxsize=SSE_QUEUE_MAXSIZE)
     notification_subscribers[username].add(q)
 
     def gen():
         try:
             # Send an initial comment to establish the stream
-            yield ': connected\n\n'
+            yield b': connected\n\n'
             while True:
-                payload = q.get()
-                data = json.dumps(payload)
-                yield f'data: {data}\n\n'
+                try:
+                    # Frames arrive pre-serialized as bytes from push_sse_frame
+                    yield q.get(timeout=15)
+                except queue.Empty:
+                    # Heartbeat comment keeps idle connections open through proxies
+                    yield b':\n\n'
         except GeneratorExit:
             pass
         finally:
@@ -3756,22 +4325,50 @@ def notifications_stream():
 
 
 
-def _resize_pil_max_side(pil_image: Image.Image, max_side: int = 1024) -> Image.Image:
+def _load_pil_max_side(path: str, max_side: int = 1024) -> Image.Image:
+    """
+    Decode an image file straight into an RGB PIL image whose longest side is at most `max_side`.
+    JPEG draft mode lets libjpeg decode at a reduced DCT scale, and EXIF orientation is applied like cv2.imread does.
+    """
+    with Image.open(path) as img:
+        img.draft('RGB', (max_side, max_side))
+        img = ImageOps.exif_transpose(img).convert('RGB')
+    img.thumbnail((max_side, max_side), Image.BOX)
+    return img
+
+
+_IMREAD_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def _imread_reduced(path: str, max_side: int = 1024) -> Optional[np.ndarray]:
     """
-    Resize a PIL image to ensure the longest side is at most `max_side`.
-    Preserves aspect ratio. Returns the original image if already small enough.
+    Decode an image with libjpeg's DCT scaling, picking the largest reduction that keeps the longest side >= `max_side`.
+    Only the header is read to size the decode; files that cannot be probed fall back to a full-resolution read.
     """
+    flag = cv2.IMREAD_COLOR
     try:
-        width, height = pil_image.size
-        longest = max(width, height)
-        if longest <= max_side:
-            return pil_image
-        scale = max_side / float(longest)
-        new_size = (max(1, int(width * scale)), max(1, int(height * scale)))
-        return pil_image.resize(new_size, Image.LANCZOS)
+        with Image.open(path) as probe:
+            longest = max(probe.size)
+        for factor, reduced_flag in _IMREAD_REDUCED_FLAGS:
+            if longest // factor >= max_side:
+                flag = reduced_flag
+                break
     except Exception:
-        # If resize fails for any reason, return the original to avoid blocking
-        return pil_image
+        pass
+    return cv2.imread(path, flag)
+
+
+# ORB detectors and matchers are not safe to share between threads, so each worker thread keeps its own pair
+_cv_thread_local = threading.local()
+
+
+def _get_orb_matcher() -> Tuple[Any, Any]:
+    """Return this thread's cached (ORB detector, Hamming BFMatcher) pair, creating it on first use."""
+    pair = getattr(_cv_thread_local, 'orb_matcher', None)
+    if pair is None:
+        pair = (cv2.ORB_create(800), cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True))
+        _cv_thread_local.orb_matcher = pair
+    return pair
 
 
 def _fast_cleanup_fallback(before_cv: np.ndarray, after_cv: np.ndarray) -> Dict[str, Any]:
@@ -3794,18 +4391,18 @@ def _fast_cleanup_fallback(before_cv: np.ndarray, after_cv: np.ndarray) -> Dict[
             scale = max_side / float(longest)
             return cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
 
-        b = _downscale(before_cv)
-        a = _downscale(after_cv)
+        # Everything below works on grayscale, so convert once and reuse it for matching, warping and diffing
+        b = cv2.cvtColor(_downscale(before_cv), cv2.COLOR_BGR2GRAY)
+        a = cv2.cvtColor(_downscale(after_cv), cv2.COLOR_BGR2GRAY)
 
         # ORB feature matching for scene consistency
-        orb = cv2.ORB_create(800)
-        kb, db = orb.detectAndCompute(cv2.cvtColor(b, cv2.COLOR_BGR2GRAY), None)
-        ka, da = orb.detectAndCompute(cv2.cvtColor(a, cv2.COLOR_BGR2GRAY), None)
+        orb, bf = _get_orb_matcher()
+        kb, db = orb.detectAndCompute(b, None)
+        ka, da = orb.detectAndCompute(a, None)
         if db is None or da is None or len(db) < 40 or len(da) < 40:
             return {"scene_match": False, "waste_present_before": False, "cleanup_verified": False, "fallback": True}
-        bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
         matches = bf.match(db, da)
-        matches = sorted(matches, key=lambda m: m.distance)
+        # Only matches under the distance cut-off are used (and their order doesn't matter), so no sort
         good = [m for m in matches if m.distance <= 48]
         scene_match = len(good) >= 60
 
@@ -3817,8 +4414,11 @@ def _fast_cleanup_fallback(before_cv: np.ndarray, after_cv: np.ndarray) -> Dict[
         waste_present_before = False
         try:
             if len(good) >= 80:
-                src_pts = np.float32([kb[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
-                dst_pts = np.float32([ka[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+                # Gather matched keypoint coordinates in one C-side pass instead of per-match attribute access
+                q_idx = np.fromiter((m.queryIdx for m in good), dtype=np.int32, count=len(good))
+                t_idx = np.fromiter((m.trainIdx for m in good), dtype=np.int32, count=len(good))
+                src_pts = cv2.KeyPoint_convert(kb)[q_idx].reshape(-1, 1, 2)
+                dst_pts = cv2.KeyPoint_convert(ka)[t_idx].reshape(-1, 1, 2)
                 H, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
                 if H is not None:
                     b_aligned = cv2.warpPerspective(b, H, (a.shape[1], a.shape[0]))
@@ -3830,10 +4430,8 @@ def _fast_cleanup_fallback(before_cv: np.ndarray, after_cv: np.ndarray) -> Dict[
             b_aligned = cv2.resize(b, (a.shape[1], a.shape[0]), interpolation=cv2.INTER_AREA)
 
         # Absolute difference analysis
-        b_gray = cv2.cvtColor(b_aligned, cv2.COLOR_BGR2GRAY)
-        a_gray = cv2.cvtColor(a, cv2.COLOR_BGR2GRAY)
-        b_gray = cv2.GaussianBlur(b_gray, (5, 5), 0)
-        a_gray = cv2.GaussianBlur(a_gray, (5, 5), 0)
+        b_gray = cv2.GaussianBlur(b_aligned, (5, 5), 0)
+        a_gray = cv2.GaussianBlur(a, (5, 5), 0)
         diff = cv2.absdiff(b_gray, a_gray)
         _, diff_bin = cv2.threshold(diff, 28, 255, cv2.THRESH_BINARY)
         diff_bin = cv2.morphologyEx(diff_bin, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8), iterations=1)
@@ -3859,7 +4457,7 @@ def _fast_cleanup_fallback(before_cv: np.ndarray, after_cv: np.ndarray) -> Dict[
         return {"scene_match": False, "waste_present_before": False, "cleanup_verified": False, "fallback": True}
 
 
-def verify_cleanup_with_gemini(original_image: np.ndarray, before_image: np.ndarray, after_image: np.ndarray) -> Dict[str, Any]:
+def verify_cleanup_with_gemini(original_path: str, before_path: str, after_path: str) -> Dict[str, Any]:
 	"""
 	Verify cleanup using Gemini API with the exact prompt specified
 	"""
@@ -3873,13 +4471,8 @@ def verify_cleanup_with_gemini(original_image: np.ndarray, before_image: np.ndar
 		}
 	
 	try:
-		# Convert OpenCV images to PIL Images and downscale for faster inference
-		images = []
-		for img in [original_image, before_image, after_image]:
-			image_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-			pil_image = Image.fromarray(image_rgb)
-			pil_image = _resize_pil_max_side(pil_image, max_side=1024)
-			images.append(pil_image)
+		# Decode the stored files directly at inference size
+		images = [_load_pil_max_side(path, max_side=1024) for path in (original_path, before_path, after_path)]
 		
 		# Initialize Gemini model
 		model = genai.GenerativeModel('gemini-2.0-flash')
@@ -3906,9 +4499,10 @@ Cleanup Result: Is the garbage, waste, or pollution visible in Image 2 now absen
 
 Respond with a compact JSON object only (no prose): {"scene_match": [true/false], "waste_present_before": [true/false], "cleanup_verified": [true/false]}"""
 		
-		# Generate response with a strict timeout to avoid hanging requests
+		# One call answers all three checks; JSON mode keeps the reply to the bare object (no prose or code fences)
 		response = model.generate_content(
 			[prompt] + images,
+			generation_config={"response_mime_type": "application/json", "temperature": 0},
 			request_options={"timeout": 25},
 		)
 		
@@ -3926,7 +4520,9 @@ Respond with a compact JSON object only (no prose): {"scene_match": [true/false]
 		
 		# Try to extract JSON from response
 		json_text = None
-		if '```json' in response_text:
+		if response_text.startswith('{') and response_text.endswith('}'):
+			json_text = response_text
+		elif '```json' in response_text:
 			json_start = response_text.find('```json') + 7
 			json_end = response_text.find('```', json_start)
 			json_text = response_text[json_start:json_end].strip()
@@ -3945,7 +4541,7 @@ Respond with a compact JSON object only (no prose): {"scene_match": [true/false]
 			}
 		
 		try:
-			result = json.loads(json_text)
+			result = _json_loads(json_text)
 		except json.JSONDecodeError:
 			return {
 				"scene_match": False,
@@ -3976,6 +4572,53 @@ Respond with a compact JSON object only (no prose): {"scene_match": [true/false]
 		}
 
 
+# Cached Gemini verdicts older than this are deleted by the scheduler loop
+GEMINI_CACHE_TTL_DAYS = int(os.environ.get('GEMINI_CACHE_TTL_DAYS', '30'))
+
+# Gemini verifications currently running, keyed by image hash, so identical concurrent submissions share one call
+_gemini_inflight: Dict[str, Future] = {}
+_gemini_inflight_lock = threading.Lock()
+
+
+def verify_cleanup_cached(cache_key: str, original_path: str, before_path: str, after_path: str) -> Dict[str, Any]:
+    """
+    verify_cleanup_with_gemini with a persistent result cache and in-flight de-duplication.
+    Only clean verdicts are cached; errors, fallbacks and unparseable replies are always retried.
+    """
+    try:
+        with get_db_connection() as conn:
+            row = conn.execute('SELECT result_json FROM gemini_cache WHERE hash = ?', (cache_key,)).fetchone()
+        if row is not None:
+            return _json_loads(row[0])
+    except Exception as e:
+        print(f"Gemini cache lookup error: {e}")
+
+    with _gemini_inflight_lock:
+        pending = _gemini_inflight.get(cache_key)
+        if pending is None:
+            owner = Future()
+            _gemini_inflight[cache_key] = owner
+    if pending is not None:
+        return pending.result()
+
+    try:
+        result = verify_cleanup_with_gemini(original_path, before_path, after_path)
+        if not result.get("fallback") and not result.get("error") and "raw_response" not in result:
+            try:
+                with get_db_connection() as conn:
+                    conn.execute('INSERT OR REPLACE INTO gemini_cache (hash, result_json) VALUES (?, ?)', (cache_key, _json_dumps(result)))
+            except Exception as e:
+                print(f"Gemini cache store error: {e}")
+        owner.set_result(result)
+        return result
+    except BaseException as e:
+        owner.set_exception(e)
+        raise
+    finally:
+        with _gemini_inflight_lock:
+            _gemini_inflight.pop(cache_key, None)
+
+
 @app.route('/api/verify_cleanup', methods=['POST'])
 def verify_cleanup() -> Tuple[Any, int]:
     """
@@ -4001,31 +4644,28 @@ def verify_cleanup() -> Tuple[Any, int]:
     if before_file.filename == '' or after_file.filename == '':
         return jsonify({"error": "empty filenames"}), 400
 
-    # Read and persist files (ensure both are saved correctly)
-    before_bytes = before_file.read()
-    after_bytes = after_file.read()
-
-    # Create uploads directory
-    uploads_dir = os.path.join(os.path.dirname(__file__), 'uploads')
-    os.makedirs(uploads_dir, exist_ok=True)
-
     # Build filenames
     before_filename = f"before_{int(time.time())}.jpg"
     after_filename = f"after_{int(time.time())}.jpg"
-    before_path = os.path.join(uploads_dir, before_filename)
-    after_path = os.path.join(uploads_dir, after_filename)
+    before_path = os.path.join(UPLOADS_DIR, before_filename)
+    after_path = os.path.join(UPLOADS_DIR, after_filename)
 
-    # Save both images to disk
+    # Stream both images to disk in 1 MiB chunks instead of buffering whole uploads in memory
     with open(before_path, 'wb') as f:
-        f.write(before_bytes)
+        shutil.copyfileobj(before_file.stream, f, length=1024 * 1024)
     with open(after_path, 'wb') as f:
-        f.write(after_bytes)
+        shutil.copyfileobj(after_file.stream, f, length=1024 * 1024)
 
-    # Get bounty information
     with get_db_connection() as conn:
+        # Bounty, pending clan claim and requester in a single round-trip
         row = conn.execute(
-            'SELECT latitude, longitude, waste_image_url, status FROM waste_bounty WHERE id = ?',
-            (bounty_id,),
+            'SELECT b.latitude, b.longitude, b.waste_image_url, b.status, '
+            '       EXISTS (SELECT 1 FROM clan_bounty_claims c WHERE c.bounty_id = b.id AND c.status = "pending") AS has_pending_claim, '
+            '       u.id, u.total_points '
+            'FROM waste_bounty b '
+            'LEFT JOIN users u ON u.username = ? '
+            'WHERE b.id = ?',
+            (username, bounty_id),
         ).fetchone()
         if row is None:
             return jsonify({"error": "bounty not found"}), 404
@@ -4034,179 +4674,179 @@ def verify_cleanup() -> Tuple[Any, int]:
         if status != 'REPORTED':
             return jsonify({"error": "bounty is no longer available"}), 400
 
-    # Before proceeding, block cleanup if there is a pending clan claim on this bounty
-    try:
-        with get_db_connection() as conn:
-            pending_claim = conn.execute(
-                'SELECT 1 FROM clan_bounty_claims WHERE bounty_id = ? AND status = "pending" LIMIT 1',
-                (bounty_id,)
-            ).fetchone()
-            if pending_claim is not None:
-                return jsonify({"error": "Clan participation request pending approval for this bounty. Please wait for leader decision or ask leader to approve."}), 409
-    except Exception:
-        # Do not block on errors here; continue
-        pass
-
-    # Load original image for comparison
-    original_image_path = os.path.join(os.path.dirname(__file__), original_image_url.lstrip('/'))
-    if not os.path.exists(original_image_path):
-        return jsonify({"error": "original bounty image not found"}), 500
-
-    # Optional: Development/testing mode to bypass Gemini scene check (server-controlled only)
-    dev_mode = (os.environ.get('DEV_MODE_CLEANUP') == '1')
+        # Block cleanup if there is a pending clan claim on this bounty
+        if row[4]:
+            return jsonify({"error": "Clan participation request pending approval for this bounty. Please wait for leader decision or ask leader to approve."}), 409
 
-    # Convert images to OpenCV format for Gemini analysis
-    original_image = cv2.imread(original_image_path)
-    before_image = cv2.imread(before_path)
-    after_image = cv2.imread(after_path)
-
-    # Verify cleanup with Gemini AI
-    if not GEMINI_AVAILABLE and not dev_mode:
-        return jsonify({
-            "error": "Gemini verification is not available on the server. Set GEMINI_API_KEY to enable verification."
-        }), 503
-
-    verification_result = (
-        verify_cleanup_with_gemini(original_image, before_image, after_image)
-        if not dev_mode
-        else {
-            "scene_match": True,
-            "waste_present_before": True,
-            "cleanup_verified": True,
-            "fallback": True,
-        }
-    )
-
-    # If Gemini timed out/failed, attempt a conservative classical CV fallback to avoid hanging
-    if (verification_result.get("fallback", False) or verification_result.get("error")) and not dev_mode:
-        heuristic = _fast_cleanup_fallback(before_image, after_image)
-        # Only override if heuristic approves; otherwise keep Gemini result to provide error context
-        if heuristic.get("scene_match") and heuristic.get("waste_present_before") and heuristic.get("cleanup_verified"):
-            verification_result = heuristic
+        if row[5] is None:
+            return jsonify({"error": "user not found"}), 404
+        user_id, current_points = int(row[5]), int(row[6])
 
-    # Check if all three conditions are met
-    scene_match = verification_result.get("scene_match", False)
-    waste_present_before = verification_result.get("waste_present_before", False)
-    cleanup_verified = verification_result.get("cleanup_verified", False)
+        # Load original image for comparison
+        original_image_path = os.path.join(BASE_DIR, original_image_url.lstrip('/'))
+        if not os.path.exists(original_image_path):
+            return jsonify({"error": "original bounty image not found"}), 500
 
-    # Get user info
-    with get_db_connection() as conn:
-        row = conn.execute('SELECT id, total_points FROM users WHERE username = ?', (username,)).fetchone()
-        if row is None:
-            return jsonify({"error": "user not found"}), 404
-        user_id, current_points = int(row[0]), int(row[1])
+        # Optional: Development/testing mode to bypass Gemini scene check (server-controlled only)
+        dev_mode = (os.environ.get('DEV_MODE_CLEANUP') == '1')
 
-    # Process verification result
-    if scene_match and waste_present_before and cleanup_verified:
-        # Cleanup approved - update bounty and award points
-        with get_db_connection() as conn:
-            # Determine if clan-approved participation exists for this bounty for the user's clan
+        # Verify cleanup with Gemini AI
+        if not GEMINI_AVAILABLE and not dev_mode:
+            return jsonify({
+                "error": "Gemini verification is not available on the server. Set GEMINI_API_KEY to enable verification."
+            }), 503
+
+        # Dev mode stubs the verdict, so there is nothing to hash or decode
+        if dev_mode:
+            verification_result = {
+                "scene_match": True,
+                "waste_present_before": True,
+                "cleanup_verified": True,
+                "fallback": True,
+            }
+        else:
+            # Identical resubmissions (double clicks, retries) reuse the cached or in-flight Gemini verdict
+            cleanup_hasher = hashlib.sha256()
+            for image_path in (original_image_path, before_path, after_path):
+                _update_hash_from_file(cleanup_hasher, image_path)
+            cleanup_hash = cleanup_hasher.hexdigest()
+            # Decodes the stored files itself, so no OpenCV arrays are built unless the fallback below needs them
+            verification_result = verify_cleanup_cached(cleanup_hash, original_image_path, before_path, after_path)
+
+        # Determine if clan-approved participation exists for this bounty for the user's clan (with the leader, for the payout)
+        u_clan_id = None
+        clan_claim_approved = False
+        leader_id = None
+        try:
+            clan_row = conn.execute(
+                'SELECT cm.clan_id, '
+                '       EXISTS (SELECT 1 FROM clan_bounty_claims c WHERE c.bounty_id = ? AND c.clan_id = cm.clan_id AND c.status = "approved"), '
+                '       cl.leader_user_id '
+                'FROM clan_members cm LEFT JOIN clans cl ON cl.id = cm.clan_id WHERE cm.user_id = ?',
+                (bounty_id, user_id),
+            ).fetchone()
+            if clan_row:
+                u_clan_id, clan_claim_approved = int(clan_row[0]), bool(clan_row[1])
+                leader_id = int(clan_row[2]) if clan_row[2] is not None else None
+        except Exception:
             u_clan_id = None
-            try:
-                u_clan_row = conn.execute('SELECT clan_id FROM clan_members WHERE user_id = (SELECT id FROM users WHERE username = ?)', (username,)).fetchone()
-                u_clan_id = int(u_clan_row[0]) if u_clan_row else None
-            except Exception:
-                u_clan_id = None
 
-            # Update bounty status and persist image URLs
-            conn.execute(
-                'UPDATE waste_bounty SET status = "CLOSED", claimed_by_user_id = ?, claimed_at = CURRENT_TIMESTAMP, completed_at = CURRENT_TIMESTAMP, before_image_url = ?, after_image_url = ? WHERE id = ?',
-                (user_id, f"/uploads/{before_filename}", f"/uploads/{after_filename}", bounty_id),
-            )
+        # If Gemini timed out/failed, attempt a conservative classical CV fallback to avoid hanging
+        if (verification_result.get("fallback", False) or verification_result.get("error")) and not dev_mode:
+            heuristic = _fast_cleanup_fallback(_imread_reduced(before_path), _imread_reduced(after_path))
+            # Only override if heuristic approves; otherwise keep Gemini result to provide error context
+            if heuristic.get("scene_match") and heuristic.get("waste_present_before") and heuristic.get("cleanup_verified"):
+                verification_result = heuristic
+
+        # Check if all three conditions are met
+        scene_match = verification_result.get("scene_match", False)
+        waste_present_before = verification_result.get("waste_present_before", False)
+        cleanup_verified = verification_result.get("cleanup_verified", False)
+
+        if not (scene_match and waste_present_before and cleanup_verified):
+            # Cleanup not approved
+            reasons = []
+            if not scene_match:
+                reasons.append("Scene mismatch - photos don't show the same location")
+            if not waste_present_before:
+                reasons.append("No significant waste detected in before photo")
+            if not cleanup_verified:
+                reasons.append("Cleanup not verified - waste still present in after photo")
 
-            points_awarded_to_requester = 0
-            # If there is an approved clan claim for the user's clan, distribute clan reward equally
-            clan_awarded = False
-            if u_clan_id is not None:
-                approved = conn.execute(
-                    'SELECT 1 FROM clan_bounty_claims WHERE bounty_id = ? AND clan_id = ? AND status = "approved" LIMIT 1',
-                    (bounty_id, u_clan_id)
-                ).fetchone()
-                if approved is not None:
-                    clan_awarded = True
-                    # Fetch all clan members
-                    members = conn.execute(
-                        'SELECT u.id FROM clan_members cm JOIN users u ON u.id = cm.user_id WHERE cm.clan_id = ?',
-                        (u_clan_id,)
-                    ).fetchall()
-                    member_ids = [int(r[0]) for r in members] if members else []
-                    if member_ids:
-                        base = CLAN_BOUNTY_REWARD // len(member_ids)
-                        remainder = CLAN_BOUNTY_REWARD - (base * len(member_ids))
-                        # Leader should receive remainder first if exists
-                        leader_row = conn.execute('SELECT leader_user_id FROM clans WHERE id = ?', (u_clan_id,)).fetchone()
-                        leader_id = int(leader_row[0]) if leader_row else None
-                        # Build distribution map
-                        distribution: Dict[int, int] = {mid: base for mid in member_ids}
-                        if remainder > 0:
-                            # Try to allocate to leader
-                            if leader_id in distribution:
-                                distribution[leader_id] += remainder
-                            else:
-                                # Allocate remainder to the first N members deterministically
-                                for i in range(remainder):
-                                    distribution[member_ids[i % len(member_ids)]] += 1
-                        # Apply updates and transactions
-                        for mid, inc in distribution.items():
-                            conn.execute('UPDATE users SET total_points = total_points + ? WHERE id = ?', (inc, mid))
-                            conn.execute('INSERT INTO transactions (user_id, points_change, reason) VALUES (?, ?, ?)', (mid, inc, f'Clan Bounty Cleanup Completed - Bounty #{bounty_id}'))
-                        # Set requester share for response
-                        if user_id in distribution:
-                            points_awarded_to_requester = distribution[user_id]
-                    else:
-                        # No members? Fallback award to requester only
-                        conn.execute('UPDATE users SET total_points = total_points + ? WHERE id = ?', (CLAN_BOUNTY_REWARD, user_id))
-                        conn.execute('INSERT INTO transactions (user_id, points_change, reason) VALUES (?, ?, ?)', (user_id, CLAN_BOUNTY_REWARD, f'Clan Bounty Cleanup Completed - Bounty #{bounty_id}'))
-                        points_awarded_to_requester = CLAN_BOUNTY_REWARD
-
-            if not clan_awarded:
-                # Individual reward
-                conn.execute('UPDATE users SET total_points = total_points + ? WHERE id = ?', (INDIVIDUAL_BOUNTY_REWARD, user_id))
-                conn.execute('INSERT INTO transactions (user_id, points_change, reason) VALUES (?, ?, ?)', (user_id, INDIVIDUAL_BOUNTY_REWARD, f'Bounty Cleanup Completed - Bounty #{bounty_id}'))
-                points_awarded_to_requester = INDIVIDUAL_BOUNTY_REWARD
-
-            # Read back updated total for requester
+            return jsonify({
+                "message": "Cleanup verification failed",
+                "reasons": reasons,
+                "verification_result": verification_result,
+            }), 400
+
+        # Cleanup approved - update bounty and award points in one write transaction
+        conn.execute('BEGIN IMMEDIATE')
+
+        # Update bounty status and persist image URLs; the status guard stops a concurrent verification double-awarding
+        closed = conn.execute(
+            'UPDATE waste_bounty SET status = "CLOSED", claimed_by_user_id = ?, claimed_at = CURRENT_TIMESTAMP, completed_at = CURRENT_TIMESTAMP, before_image_url = ?, after_image_url = ? WHERE id = ? AND status = "REPORTED"',
+            (user_id, f"/uploads/{before_filename}", f"/uploads/{after_filename}", bounty_id),
+        )
+        if closed.rowcount == 0:
+            conn.rollback()
+            return jsonify({"error": "bounty is no longer available"}), 409
+
+        points_awarded_to_requester = 0
+        # Transaction reasons for this bounty, built once for every award branch below
+        reason_clan = f'Clan Bounty Cleanup Completed - Bounty #{bounty_id}'
+        reason_individual = f'Bounty Cleanup Completed - Bounty #{bounty_id}'
+        # If there is an approved clan claim for the user's clan, distribute clan reward equally
+        clan_awarded = False
+        if u_clan_id is not None and clan_claim_approved:
+            clan_awarded = True
+            # Fetch all clan members (only needed once an approved claim is confirmed)
+            members = conn.execute(
+                'SELECT u.id FROM clan_members cm JOIN users u ON u.id = cm.user_id WHERE cm.clan_id = ?',
+                (u_clan_id,)
+            ).fetchall()
+            member_ids = [int(r[0]) for r in members] if members else []
+            if member_ids:
+                base, remainder = divmod(CLAN_BOUNTY_REWARD, len(member_ids))
+                # Leader should receive remainder first if exists
+                # Build distribution map
+                if leader_id in member_ids:
+                    distribution: Dict[int, int] = {mid: base for mid in member_ids}
+                    distribution[leader_id] += remainder
+                else:
+                    # remainder < member count, so the first `remainder` members get one extra point each
+                    distribution = {mid: base + (1 if i < remainder else 0) for i, mid in enumerate(member_ids)}
+                # Apply updates and transactions, one prepared statement each for all members
+                shares = list(distribution.items())
+                conn.executemany('UPDATE users SET total_points = total_points + ? WHERE id = ?', [(inc, mid) for mid, inc in shares])
+                conn.executemany('INSERT INTO transactions (user_id, points_change, reason) VALUES (?, ?, ?)', [(mid, inc, reason_clan) for mid, inc in shares])
+                _invalidate_user_stats(conn, *distribution)
+                # Set requester share for response
+                if user_id in distribution:
+                    points_awarded_to_requester = distribution[user_id]
+            else:
+                # No members? Fallback award to requester only
+                conn.execute('UPDATE users SET total_points = total_points + ? WHERE id = ?', (CLAN_BOUNTY_REWARD, user_id))
+                conn.execute('INSERT INTO transactions (user_id, points_change, reason) VALUES (?, ?, ?)', (user_id, CLAN_BOUNTY_REWARD, reason_clan))
+                points_awarded_to_requester = CLAN_BOUNTY_REWARD
+
+        if not clan_awarded:
+            # Individual reward; RETURNING hands back the new total without a separate read
+            total_row = conn.execute(
+                'UPDATE users SET total_points = total_points + ? WHERE id = ? RETURNING total_points',
+                (INDIVIDUAL_BOUNTY_REWARD, user_id),
+            ).fetchone()
+            conn.execute('INSERT INTO transactions (user_id, points_change, reason) VALUES (?, ?, ?)', (user_id, INDIVIDUAL_BOUNTY_REWARD, reason_individual))
+            points_awarded_to_requester = INDIVIDUAL_BOUNTY_REWARD
+        else:
+            # Read back updated total for requester after the clan payout
             total_row = conn.execute('SELECT total_points FROM users WHERE id = ?', (user_id,)).fetchone()
-            new_total = int(total_row[0]) if total_row else (current_points + points_awarded_to_requester)
-
-            # Also record a conservative carbon event for the cleanup (treat as 1 plastic item saved)
-            try:
-                factors = _load_emission_factors()
-                amount = round(float(factors.get('plastic', 0.3)) * 1, 3)
-                if amount > 0:
-                    conn.execute('INSERT INTO carbon_events (user_id, category, amount_kg) VALUES (?, ?, ?)', (user_id, 'plastic', amount))
-            except Exception:
-                pass
-            conn.commit()
+        new_total = int(total_row[0]) if total_row else (current_points + points_awarded_to_requester)
+        _invalidate_user_stats(conn, user_id)
 
-            # Auto-verify mission progress for cleanup events
-            try:
-                _increment_missions_for_event(conn, user_id, event='cleanup_verified', increment=1, category=None)
-            except Exception:
-                pass
+        # Also record a conservative carbon event for the cleanup (treat as 1 plastic item saved)
+        try:
+            factors = _load_emission_factors()
+            amount = round(float(factors.get('plastic', 0.3)) * 1, 3)
+            if amount > 0:
+                conn.execute('INSERT INTO carbon_events (user_id, category, amount_kg) VALUES (?, ?, ?)', (user_id, 'plastic', amount))
+                _evict_after_commit(conn, _carbon_stats_cache, user_id)
+        except Exception:
+            pass
+        conn.commit()
 
-        return jsonify({
-            "message": "Cleanup verified successfully! Points awarded.",
-            "points_awarded": points_awarded_to_requester,
-            "total_points": new_total,
-            "verification_result": verification_result,
-            "dev_mode": dev_mode,
-        }), 200
-    else:
-        # Cleanup not approved
-        reasons = []
-        if not scene_match:
-            reasons.append("Scene mismatch - photos don't show the same location")
-        if not waste_present_before:
-            reasons.append("No significant waste detected in before photo")
-        if not cleanup_verified:
-            reasons.append("Cleanup not verified - waste still present in after photo")
+        # Auto-verify mission progress for cleanup events
+        try:
+            _increment_missions_for_event(conn, user_id, event='cleanup_verified', increment=1, category=None)
+        except Exception:
+            pass
 
-        return jsonify({
-            "message": "Cleanup verification failed",
-            "reasons": reasons,
-            "verification_result": verification_result,
-        }), 400
+    return jsonify({
+        "message": "Cleanup verified successfully! Points awarded.",
+        "points_awarded": points_awarded_to_requester,
+        "total_points": new_total,
+        "verification_result": verification_result,
+        "dev_mode": dev_mode,
+    }), 200
 
 
 @app.route('/api/detect', methods=['POST'])
@@ -4248,6 +4888,8 @@ def detect() -> Tuple[Any, int]:
 		
 		# Generate image hash for duplicate detection
 		file_hash = generate_image_hash(file_bytes)
+		# Release the raw upload before the long Gemini round-trip; only the decoded image is needed now
+		del file_bytes, np_arr
 		
 		# Use existing image analysis
 		gemini_result = analyze_with_gemini(image)
@@ -4293,27 +4935,29 @@ def detect() -> Tuple[Any, int]:
 		# Check for duplicates and update database
 		duplicate = False
 		with get_db_connection() as conn:
+			# Read-check-award runs in one write transaction so concurrent uploads cannot lose points
+			conn.execute('BEGIN IMMEDIATE')
 			row = conn.execute('SELECT id, total_points FROM users WHERE username = ?', (username,)).fetchone()
 			if row is None:
 				return jsonify({"error": "user not found"}), 404
 			user_id = int(row[0])
 			current_total = int(row[1])
 
-			# Check if this image hash already exists for this user
-			existing_hash = conn.execute(
-				'SELECT id FROM image_hashes WHERE user_id = ? AND image_hash = ?', 
+			# Claim this image hash for the user; UNIQUE(user_id, image_hash) ignores the insert for a repeat
+			claimed = conn.execute(
+				'INSERT OR IGNORE INTO image_hashes (user_id, image_hash) VALUES (?, ?)',
 				(user_id, file_hash)
-			).fetchone()
+			).rowcount
 
-			if existing_hash:
+			if not claimed:
 				duplicate = True
 				new_total = current_total
 				message = 'This exact image has already been analyzed. No additional points awarded.'
 			else:
-				# Store the image hash and award points
+				# Award points for the newly stored hash
 				new_total = current_total + awarded_points
 				conn.execute('UPDATE users SET total_points = ? WHERE id = ?', (new_total, user_id))
-				conn.execute('INSERT INTO image_hashes (user_id, image_hash) VALUES (?, ?)', (user_id, file_hash))
+				_invalidate_user_stats(conn, user_id)
 				if awarded_points != 0:
 					conn.execute('INSERT INTO transactions (user_id, points_change, reason) VALUES (?, ?, ?)', (user_id, awarded_points, 'Waste Detected'))
 					conn.execute('UPDATE stats SET detections = detections + 1 WHERE id = 1')
@@ -4337,6 +4981,7 @@ def detect() -> Tuple[Any, int]:
 					amount = round(per_item * item_count, 3)
 					if amount > 0:
 						conn.execute('INSERT INTO carbon_events (user_id, category, amount_kg) VALUES (?, ?, ?)', (user_id, cat, amount))
+						_evict_after_commit(conn, _carbon_stats_cache, user_id)
 					if item_count > 0:
 						try:
 							_increment_missions_for_event(conn, user_id, event='detect', increment=item_count, category=cat)
@@ -4376,12 +5021,9 @@ def detect() -> Tuple[Any, int]:
 			# Extract keyframes from video
 			keyframes = extract_keyframes_from_video(file_bytes)
 			
-			# Analyze video sequence with Gemini
+			# Analyze video sequence with Gemini; the first frame's hash is used for duplicate detection
 			video_analysis = analyze_video_sequence_with_gemini(keyframes)
-			
-			# Generate hash for duplicate detection (using first frame)
-			first_frame_bytes = cv2.imencode('.jpg', keyframes[0])[1].tobytes()
-			file_hash = generate_image_hash(first_frame_bytes)
+			file_hash = generate_image_hash(keyframes[0])
 			
 			# Determine points based on video analysis with additional validation
 			awarded_points = 0
@@ -4396,12 +5038,10 @@ def detect() -> Tuple[Any, int]:
 			print(f"Reasoning: {reasoning}")
 			
 			# Check for invalid waste types (hands, dustbins, etc.)
-			invalid_types = ["hand", "hands", "dustbin", "trash", "bin", "container", "bag", "unknown"]
-			is_valid_waste_type = not any(invalid_type in waste_type for invalid_type in invalid_types)
+			is_valid_waste_type = _INVALID_VIDEO_WASTE_TYPES_RE.search(waste_type) is None
 			
 			# Check reasoning for disposal action keywords (more lenient)
-			disposal_keywords = ["deposited", "thrown", "placed", "disposed", "inside", "into", "bin", "dustbin", "dropped", "put"]
-			has_disposal_action = any(keyword in reasoning for keyword in disposal_keywords)
+			has_disposal_action = _DISPOSAL_KEYWORDS_RE.search(reasoning) is not None
 			
 			# More lenient validation - if AI says disposal is verified and waste type is valid, trust it
 			if disposal_verified and is_valid_waste_type:
@@ -4418,27 +5058,29 @@ def detect() -> Tuple[Any, int]:
 			# Check for duplicates and update database
 			duplicate = False
 			with get_db_connection() as conn:
+				# Read-check-award runs in one write transaction so concurrent uploads cannot lose points
+				conn.execute('BEGIN IMMEDIATE')
 				row = conn.execute('SELECT id, total_points FROM users WHERE username = ?', (username,)).fetchone()
 				if row is None:
 					return jsonify({"error": "user not found"}), 404
 				user_id = int(row[0])
 				current_total = int(row[1])
 
-				# Check if this video hash already exists for this user
-				existing_hash = conn.execute(
-					'SELECT id FROM image_hashes WHERE user_id = ? AND image_hash = ?', 
+				# Claim this video hash for the user; UNIQUE(user_id, image_hash) ignores the insert for a repeat
+				claimed = conn.execute(
+					'INSERT OR IGNORE INTO image_hashes (user_id, image_hash) VALUES (?, ?)',
 					(user_id, file_hash)
-				).fetchone()
+				).rowcount
 
-				if existing_hash:
+				if not claimed:
 					duplicate = True
 					new_total = current_total
 					message = 'This exact video has already been analyzed. No additional points awarded.'
 				else:
-					# Store the video hash and award points
+					# Award points for the newly stored hash
 					new_total = current_total + awarded_points
 					conn.execute('UPDATE users SET total_points = ? WHERE id = ?', (new_total, user_id))
-					conn.execute('INSERT INTO image_hashes (user_id, image_hash) VALUES (?, ?)', (user_id, file_hash))
+					_invalidate_user_stats(conn, user_id)
 					if awarded_points != 0:
 						conn.execute('INSERT INTO transactions (user_id, points_change, reason) VALUES (?, ?, ?)', (user_id, awarded_points, 'Video Disposal Verified'))
 						conn.execute('UPDATE stats SET detections = detections + 1 WHERE id = 1')
@@ -4453,6 +5095,7 @@ def detect() -> Tuple[Any, int]:
 								amount = round(per_item * 1, 3)
 								if amount > 0:
 									conn.execute('INSERT INTO carbon_events (user_id, category, amount_kg) VALUES (?, ?, ?)', (user_id, cat, amount))
+									_evict_after_commit(conn, _carbon_stats_cache, user_id)
 					except Exception:
 						pass
 					conn.commit()
@@ -4526,6 +5169,8 @@ def analyze_detailed() -> Tuple[Any, int]:
 
 		# Generate image hash for duplicate detection
 		file_hash = generate_image_hash(file_bytes)
+		# Release the raw upload before the long Gemini round-trip; only the decoded image is needed now
+		del file_bytes, np_arr
 	else:
 		# Process as video
 		try:
@@ -4533,29 +5178,10 @@ def analyze_detailed() -> Tuple[Any, int]:
 			keyframes = extract_keyframes_from_video(file_bytes)
 			
 			# Generate hash for duplicate detection (using first frame)
-			first_frame_bytes = cv2.imencode('.jpg', keyframes[0])[1].tobytes()
-			file_hash = generate_image_hash(first_frame_bytes)
+			file_hash = generate_image_hash(keyframes[0])
 		except Exception as e:
 			return jsonify({"error": f"Video processing failed: {str(e)}"}), 500
 
-	# Check if this exact file has been uploaded by this user before
-	duplicate = False
-	with get_db_connection() as conn:
-		row = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
-		if row is None:
-			return jsonify({"error": "user not found"}), 404
-		user_id = int(row[0])
-
-		# Check if this file hash already exists for this user
-		existing_hash = conn.execute(
-			'SELECT id FROM image_hashes WHERE user_id = ? AND image_hash = ?', 
-			(user_id, file_hash)
-		).fetchone()
-
-		if existing_hash:
-			# Mark as duplicate but do not abort — return analysis but flag duplicate so frontend can decide
-			duplicate = True
-
 	# Get detailed analysis based on input type
 	if input_type == 'photo':
 		# Get detailed Gemini analysis for image
@@ -4599,15 +5225,6 @@ def analyze_detailed() -> Tuple[Any, int]:
 			elif general_count > 0:
 				potential_points = NON_RECYCLABLE_FLAT_POINTS
 
-		# Persist image hash for this user to prevent future repeats
-		with get_db_connection() as conn:
-			try:
-				if not duplicate:
-					conn.execute('INSERT INTO image_hashes (user_id, image_hash) VALUES (?, ?)', (user_id, file_hash))
-					conn.commit()
-			except Exception as e:
-				print(f"Warning: failed to persist image hash: {str(e)}")
-
 		response = {
 			"analysis": gemini_result,
 			"categorized_items": categorized,
@@ -4616,11 +5233,8 @@ def analyze_detailed() -> Tuple[Any, int]:
 			"disposal_tips": [item.get("disposal_tip", "") for item in gemini_result.get("items", []) if item.get("disposal_tip")],
 			"environmental_impacts": [item.get("environmental_impact", "") for item in gemini_result.get("items", []) if item.get("environmental_impact")],
 			"summary": gemini_result.get("summary", ""),
-			"input_type": input_type,
-			"duplicate": duplicate
+			"input_type": input_type
 		}
-		
-		return jsonify(response), 200
 	
 	else:
 		# Get detailed video analysis
@@ -4647,17 +5261,27 @@ def analyze_detailed() -> Tuple[Any, int]:
 			"input_type": input_type
 		}
 
-		# Persist hash to prevent repeated submissions being treated as new
-		with get_db_connection() as conn:
-			try:
-				if not duplicate:
-					conn.execute('INSERT INTO image_hashes (user_id, image_hash) VALUES (?, ?)', (user_id, file_hash))
-					conn.commit()
-			except Exception as e:
-				print(f"Warning: failed to persist video hash: {str(e)}")
+	# Flag repeats and persist the hash in a single round-trip once analysis has succeeded
+	with get_db_connection() as conn:
+		row = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
+		if row is None:
+			return jsonify({"error": "user not found"}), 404
+		user_id = int(row[0])
 
-		response["duplicate"] = duplicate
-		return jsonify(response), 200
+		# Persist the hash so repeats are flagged; an ignored insert means this user already submitted the file.
+		# Duplicates still get the analysis so the frontend can decide
+		duplicate = False
+		try:
+			duplicate = conn.execute(
+				'INSERT OR IGNORE INTO image_hashes (user_id, image_hash) VALUES (?, ?)',
+				(user_id, file_hash)
+			).rowcount == 0
+			conn.commit()
+		except Exception as e:
+			print(f"Warning: failed to persist {'image' if input_type == 'photo' else 'video'} hash: {str(e)}")
+
+	response["duplicate"] = duplicate
+	return jsonify(response), 200
 
 
 @app.route('/api/stats', methods=['GET'])
@@ -4666,11 +5290,14 @@ def get_stats() -> Tuple[Any, int]:
 	if not username:
 		return jsonify({"error": "unauthorized"}), 401
 	with get_db_connection() as conn:
-		u = conn.execute('SELECT id, total_points FROM users WHERE username = ?', (username,)).fetchone()
-		if u is None:
+		uid = _get_user_id(conn, username)
+		if uid is None:
 			return jsonify({"error": "user not found"}), 404
-		uid = int(u[0])
-		total_now = int(u[1])
+		cached = _user_stats_cache.get(uid)
+		if cached is not None:
+			return jsonify(cached), 200
+		total_row = conn.execute('SELECT total_points FROM users WHERE id = ?', (uid,)).fetchone()
+		total_now = int(total_row[0]) if total_row else 0
 		# per-user counts from transactions
 		row_pos = conn.execute('SELECT COUNT(*) FROM transactions WHERE user_id = ? AND points_change > 0', (uid,)).fetchone()
 		row_neg = conn.execute('SELECT COUNT(*) FROM transactions WHERE user_id = ? AND points_change < 0', (uid,)).fetchone()
@@ -4684,13 +5311,15 @@ def get_stats() -> Tuple[Any, int]:
 		bc_row = conn.execute('SELECT COUNT(*) FROM waste_bounty WHERE claimed_by_user_id = ?', (uid,)).fetchone()
 		bounties_raised = int(br_row[0]) if br_row else 0
 		bounties_claimed = int(bc_row[0]) if bc_row else 0
-	return jsonify({
+	stats = {
 		"detections": detections,
 		"redemptions": redemptions,
 		"lifetime_points": lifetime_points,
 		"bounties_raised": bounties_raised,
 		"bounties_claimed": bounties_claimed,
-	}), 200
+	}
+	_user_stats_cache.set(uid, stats)
+	return jsonify(stats), 200
 
 
 @app.route('/api/streak', methods=['GET'])
@@ -4708,11 +5337,14 @@ def get_streak() -> Tuple[Any, int]:
             return jsonify({"current_streak": 0, "best_streak": 0, "last_active_date": None, "days": []}), 200
         # Build last 7 days calendar
         today = datetime.utcnow().date()
-        days = []
-        for i in range(7):
-            d = today - timedelta(days=6 - i)
-            active = (str(row[2]) == d.isoformat()) if row[2] else False
-            days.append({"date": d.isoformat(), "active": active})
+        active_iso = str(row[2]) if row[2] else None
+        base = today - timedelta(days=6)
+        days = [{"date": (base + timedelta(days=i)).isoformat(), "active": False} for i in range(7)]
+        if active_iso:
+            for d in days:
+                if d["date"] == active_iso:
+                    d["active"] = True
+                    break
         return jsonify({
             "current_streak": int(row[0] or 0),
             "best_streak": int(row[1] or 0),
@@ -4725,32 +5357,26 @@ def carbon_stats():
     username = parse_username_from_auth()
     if not username:
         return jsonify({"error": "missing auth token"}), 401
-    # Load emission factors from JSON file if available; else defaults
-    factors_path = os.path.join(os.path.dirname(__file__), 'emission_factors.json')
-    default_factors = {"plastic": 0.3, "paper": 0.1, "metal": 0.7}
-    try:
-        with open(factors_path, 'r', encoding='utf-8') as fh:
-            factors = json.load(fh)
-            if not isinstance(factors, dict):
-                factors = default_factors
-    except Exception:
-        factors = default_factors
+    # Emission factors are parsed once per process (same source the carbon events are recorded with)
+    factors = _load_emission_factors()
 
-    now = datetime.utcnow()
-    week_ago = now - timedelta(days=7)
     with get_db_connection() as conn:
         u = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
         if not u:
             return jsonify({"error": "user not found"}), 404
         uid = int(u[0])
-        rows = conn.execute('SELECT category, amount_kg FROM carbon_events WHERE user_id = ? AND created_at >= ?', (uid, week_ago.strftime('%Y-%m-%d %H:%M:%S'))).fetchall()
-        total = 0.0
-        by_cat: Dict[str, float] = defaultdict(float)
-        for r in rows:
-            cat = str(r[0]).lower()
-            amt = float(r[1])
-            total += amt
-            by_cat[cat] += amt
+        cached = _carbon_stats_cache.get(uid)
+        if cached is not None:
+            return jsonify(cached), 200
+        # Same 'YYYY-MM-DD HH:MM:SS' form as CURRENT_TIMESTAMP, without strftime; only built on a cache miss
+        week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat(sep=' ', timespec='seconds')
+        # Aggregate in SQL (served by idx_carbon_events_user_date) so only one row per category comes back
+        rows = conn.execute(
+            'SELECT LOWER(category), COALESCE(SUM(amount_kg), 0) FROM carbon_events WHERE user_id = ? AND created_at >= ? GROUP BY LOWER(category)',
+            (uid, week_ago)
+        ).fetchall()
+        by_cat: Dict[str, float] = {str(r[0]): float(r[1]) for r in rows}
+        total = sum(by_cat.values(), 0.0)
         # Normalize output to known categories
         result_sources = {
             'plastic': round(by_cat.get('plastic', 0.0), 3),
@@ -4767,27 +5393,41 @@ def carbon_stats():
             health = 90 - int((total - 0.5) * 20)  # down to ~60
         else:
             health = max(20, 60 - int((total - 2.0) * 10))
-        return jsonify({
+        summary = {
             'week_total_kg': round(total, 3),
             'sources': result_sources,
             'factors': factors,
             'planet_health': max(0, min(100, health))
-        }), 200
+        }
+        _carbon_stats_cache.set(uid, summary)
+        return jsonify(summary), 200
 
 
 # ======== Clan System ========
-def _get_user(conn: Connection, username: str) -> Optional[sqlite3.Row]:
-    return conn.execute('SELECT id, username, city, state, country, total_points FROM users WHERE username = ?', (username,)).fetchone()
-
-
-def _generate_join_code(conn: Connection) -> str:
-    # 4-digit zero-padded unique code
+def _get_user(conn: Connection, username: str) -> Optional[Dict[str, Any]]:
+    # Memoized for the current request only; location feeds clan creation and city filters, so it is read fresh each request
+    memo = _request_user_memo()
+    if memo is not None and ('user', username) in memo:
+        return memo[('user', username)]
+    row = conn.execute('SELECT id, username, city, state, country FROM users WHERE username = ?', (username,)).fetchone()
+    user = dict(row) if row is not None else None
+    if memo is not None:
+        memo[('user', username)] = user
+    return user
+
+
+def _insert_clan(conn: Connection, name: str, u: Dict[str, Any]) -> Optional[Tuple[int, str]]:
+    # 4-digit zero-padded code; the UNIQUE(join_code) conflict rejects collisions atomically
     for _ in range(100):
-        code = f"{random.randint(0, 9999):04d}"
-        exists = conn.execute('SELECT 1 FROM clans WHERE join_code = ?', (code,)).fetchone()
-        if not exists:
-            return code
-    return f"{int(time.time()) % 10000:04d}"
+        code = f"{secrets.randbelow(10000):04d}"
+        cur = conn.execute(
+            'INSERT INTO clans (name, city, state, country, leader_user_id, join_code) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(join_code) DO NOTHING',
+            (name, u["city"], u["state"], u["country"], u["id"], code)
+        )
+        if cur.rowcount:
+            return cur.lastrowid, code
+    return None
 
 
 @app.route('/api/clans', methods=['GET'])
@@ -4799,13 +5439,16 @@ def list_city_clans():
         u = _get_user(conn, username)
         if u is None:
             return jsonify({"error": "user not found"}), 404
+        cached = _city_clans_cache.get(u["city"])
+        if cached is not None:
+            return jsonify({"clans": cached}), 200
         rows = conn.execute(
-            'SELECT id, name, city, state, country, leader_user_id, created_at FROM clans WHERE city = ? ORDER BY created_at DESC',
+            'SELECT c.id, c.name, c.city, c.state, c.country, c.leader_user_id, c.created_at, u.username AS leader_username '
+            'FROM clans c LEFT JOIN users u ON u.id = c.leader_user_id WHERE c.city = ? ORDER BY c.created_at DESC',
             (u["city"],)
         ).fetchall()
         clans = []
         for r in rows:
-            leader_username = conn.execute('SELECT username FROM users WHERE id = ?', (r["leader_user_id"],)).fetchone()
             clans.append({
                 "id": r["id"],
                 "name": r["name"],
@@ -4813,9 +5456,10 @@ def list_city_clans():
                 "state": r["state"],
                 "country": r["country"],
                 "leader_user_id": r["leader_user_id"],
-                "leader_username": leader_username[0] if leader_username else None,
+                "leader_username": r["leader_username"],
                 "created_at": r["created_at"],
             })
+        _city_clans_cache.set(u["city"], clans)
         return jsonify({"clans": clans}), 200
 
 
@@ -4828,37 +5472,39 @@ def get_my_clan():
         u = _get_user(conn, username)
         if u is None:
             return jsonify({"error": "user not found"}), 404
-        row = conn.execute(
-            'SELECT c.* FROM clans c JOIN clan_members cm ON c.id = cm.clan_id JOIN users u ON u.id = cm.user_id WHERE u.username = ?',
-            (username,)
-        ).fetchone()
-        if row is None:
-            return jsonify({"clan": None}), 200
-        clan_id = row["id"]
-        members = conn.execute(
-            'SELECT u.id, u.username, u.total_points, cm.role FROM clan_members cm JOIN users u ON u.id = cm.user_id WHERE cm.clan_id = ? ORDER BY CASE WHEN cm.role = "leader" THEN 0 ELSE 1 END, u.total_points DESC',
-            (clan_id,)
+        # Clan fields, leader username and every member in one pass; the clan columns repeat on each member row
+        rows = conn.execute(
+            'SELECT c.id, c.name, c.city, c.state, c.country, c.join_code, lu.username AS leader_username, '
+            '       u.id AS member_id, u.username AS member_username, u.total_points, cm.role '
+            'FROM clans c '
+            'JOIN clan_members cm ON cm.clan_id = c.id '
+            'JOIN users u ON u.id = cm.user_id '
+            'LEFT JOIN users lu ON lu.id = c.leader_user_id '
+            'WHERE c.id = (SELECT clan_id FROM clan_members WHERE user_id = ?) '
+            'ORDER BY CASE WHEN cm.role = "leader" THEN 0 ELSE 1 END, u.total_points DESC',
+            (u["id"],)
         ).fetchall()
-        leader_user = conn.execute('SELECT username FROM users WHERE id = ?', (row["leader_user_id"],)).fetchone()
-        is_leader = bool(leader_user and leader_user[0] == username)
+        if not rows:
+            return jsonify({"clan": None}), 200
+        row = rows[0]
         resp = {
             "id": row["id"],
             "name": row["name"],
             "city": row["city"],
             "state": row["state"],
             "country": row["country"],
-            "leader_username": (leader_user[0] if leader_user else None),
+            "leader_username": row["leader_username"],
             "members": [
                 {
-                    "id": m["id"],
-                    "username": m["username"],
+                    "id": m["member_id"],
+                    "username": m["member_username"],
                     "role": m["role"],
                     "total_points": m["total_points"],
                 }
-                for m in members
+                for m in rows
             ],
         }
-        if is_leader:
+        if row["leader_username"] == username:
             resp["join_code"] = row["join_code"]
         return jsonify({"clan": resp}), 200
 
@@ -4879,14 +5525,13 @@ def create_clan():
         existing = conn.execute('SELECT 1 FROM clan_members WHERE user_id = ?', (u["id"],)).fetchone()
         if existing:
             return jsonify({"error": "already in a clan"}), 400
-        code = _generate_join_code(conn)
-        conn.execute(
-            'INSERT INTO clans (name, city, state, country, leader_user_id, join_code) VALUES (?, ?, ?, ?, ?, ?)',
-            (name, u["city"], u["state"], u["country"], u["id"], code)
-        )
-        clan_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        inserted = _insert_clan(conn, name, u)
+        if inserted is None:
+            return jsonify({"error": "no join codes available, try again later"}), 503
+        clan_id, code = inserted
         conn.execute('INSERT INTO clan_members (clan_id, user_id, role) VALUES (?, ?, ?)', (clan_id, u["id"], 'leader'))
         conn.commit()
+        _city_clans_cache.pop(u["city"])
         return jsonify({"clan_id": clan_id, "join_code": code}), 201
 
 
@@ -4947,17 +5592,17 @@ def leave_clan():
         u = _get_user(conn, username)
         if u is None:
             return jsonify({"error": "user not found"}), 404
-        row = conn.execute('SELECT cm.clan_id, c.leader_user_id FROM clan_members cm JOIN clans c ON c.id = cm.clan_id WHERE cm.user_id = ?', (u["id"],)).fetchone()
+        row = conn.execute('SELECT cm.clan_id, c.leader_user_id, c.city FROM clan_members cm JOIN clans c ON c.id = cm.clan_id WHERE cm.user_id = ?', (u["id"],)).fetchone()
         if row is None:
             return jsonify({"error": "not in a clan"}), 400
         clan_id, leader_user_id = row["clan_id"], row["leader_user_id"]
         if leader_user_id == u["id"]:
-            count = conn.execute('SELECT COUNT(*) FROM clan_members WHERE clan_id = ?', (clan_id,)).fetchone()[0]
-            if count > 1:
+            other = conn.execute('SELECT 1 FROM clan_members WHERE clan_id = ? AND user_id != ? LIMIT 1', (clan_id, u["id"])).fetchone()
+            if other:
                 return jsonify({"error": "leader cannot leave while members remain"}), 400
-            conn.execute('DELETE FROM clan_members WHERE clan_id = ?', (clan_id,))
-            conn.execute('DELETE FROM clan_messages WHERE clan_id = ?', (clan_id,))
+            # clans_delete_cascade removes the membership row and chat history
             conn.execute('DELETE FROM clans WHERE id = ?', (clan_id,))
+            _evict_after_commit(conn, _city_clans_cache, row["city"])
         else:
             conn.execute('DELETE FROM clan_members WHERE clan_id = ? AND user_id = ?', (clan_id, u["id"]))
         conn.commit()
@@ -5053,35 +5698,19 @@ def decide_clan_join_request():
         if status != 'pending':
             return jsonify({"error": "request already decided"}), 400
         if decision == 'approve':
-            # Add as member if not already in any clan
-            exists = conn.execute('SELECT 1 FROM clan_members WHERE user_id = ?', (applicant_user_id,)).fetchone()
-            if exists is None:
-                conn.execute('INSERT INTO clan_members (clan_id, user_id, role) VALUES (?, ?, ?)', (clan_id, applicant_user_id, 'member'))
+            # Add as member if not already in any clan; UNIQUE(user_id) makes this a no-op otherwise
+            conn.execute('INSERT OR IGNORE INTO clan_members (clan_id, user_id, role) VALUES (?, ?, ?)', (clan_id, applicant_user_id, 'member'))
             conn.execute('UPDATE clan_join_requests SET status = "approved", resolved_at = CURRENT_TIMESTAMP WHERE id = ?', (request_id,))
         else:
             conn.execute('UPDATE clan_join_requests SET status = "rejected", resolved_at = CURRENT_TIMESTAMP WHERE id = ?', (request_id,))
-        # Persist + notify applicant
         applicant_row = conn.execute('SELECT username FROM users WHERE id = ?', (applicant_user_id,)).fetchone()
-        try:
-            if applicant_row and applicant_row[0]:
-                app_user = applicant_row[0]
-                app_id_row = conn.execute('SELECT id FROM users WHERE username = ?', (app_user,)).fetchone()
-                if app_id_row:
-                    conn.execute(
-                        'INSERT INTO notifications (user_id, type, title, message, payload) VALUES (?, ?, ?, ?, ?)',
-                        (int(app_id_row[0]), 'CLAN_JOIN_DECISION', 'Clan join request updated', f'Your request was {decision} for clan #{clan_id}', json.dumps({"clan_id": clan_id, "decision": decision}))
-                    )
-                conn.commit()
-                notify_user(app_user, {
-                    "id": None,
-                    "type": "CLAN_JOIN_DECISION",
-                    "title": "Clan join request updated",
-                    "message": f"Your request was {decision} for clan #{clan_id}",
-                    "payload": {"clan_id": clan_id, "decision": decision},
-                    "created_at": time.strftime('%Y-%m-%d %H:%M:%S')
-                })
-        except Exception:
-            pass
+        conn.commit()
+        # Persist + notify applicant, only once the decision itself is committed
+        if applicant_row and applicant_row[0]:
+            enqueue_notification(
+                applicant_user_id, applicant_row[0], 'CLAN_JOIN_DECISION', 'Clan join request updated',
+                f'Your request was {decision} for clan #{clan_id}', {"clan_id": clan_id, "decision": decision},
+            )
         return jsonify({"status": decision}), 200
 
 
@@ -5159,21 +5788,21 @@ def create_bounty_clan_claim() -> Tuple[Any, int]:
         # Insert claim
         is_leader = (user_id == leader_user_id)
         if is_leader:
-            conn.execute(
+            cur = conn.execute(
                 'INSERT INTO clan_bounty_claims (bounty_id, clan_id, requested_by_user_id, people_strength, scheduled_at, status, decided_by_user_id, decided_at) '
                 'VALUES (?, ?, ?, ?, ?, "approved", ?, CURRENT_TIMESTAMP)',
                 (bounty_id, clan_id, user_id, people_strength, scheduled_at, user_id)
             )
-            claim_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+            claim_id = cur.lastrowid
             conn.commit()
             return jsonify({"status": "approved", "claim_id": int(claim_id)}), 201
         else:
-            conn.execute(
+            cur = conn.execute(
                 'INSERT INTO clan_bounty_claims (bounty_id, clan_id, requested_by_user_id, people_strength, scheduled_at, status) '
                 'VALUES (?, ?, ?, ?, ?, "pending")',
                 (bounty_id, clan_id, user_id, people_strength, scheduled_at)
             )
-            claim_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+            claim_id = cur.lastrowid
             # Notify clan leader
             try:
                 # Persist leader notification with context_bounty_id
@@ -5186,7 +5815,7 @@ def create_bounty_clan_claim() -> Tuple[Any, int]:
                             'CLAN_BOUNTY_REQUEST',
                             'Bounty participation request',
                             f'@{username} requested to participate in bounty #{bounty_id}',
-                            json.dumps({"clan_id": clan_id, "bounty_id": bounty_id, "people_strength": people_strength, "scheduled_at": scheduled_at}),
+                            _json_dumps({"clan_id": clan_id, "bounty_id": bounty_id, "people_strength": people_strength, "scheduled_at": scheduled_at}),
                             bounty_id
                         )
                     )
@@ -5230,10 +5859,10 @@ def list_clan_bounty_claims() -> Tuple[Any, int]:
             'WHERE cbc.clan_id = ? AND cbc.status = "pending" '
             'ORDER BY cbc.created_at ASC',
             (clan_id,)
-        ).fetchall()
-        claims: List[Dict[str, Any]] = []
-        for r in rows:
-            claims.append({
+        )
+        # Pending claims for one clan are few; built on this connection so a DB error is a 500, not a truncated body
+        claims = [
+            {
                 "id": r[0],
                 "bounty_id": r[1],
                 "requested_by_username": r[2],
@@ -5244,8 +5873,10 @@ def list_clan_bounty_claims() -> Tuple[Any, int]:
                 "state": r[7],
                 "country": r[8],
                 "waste_image_url": r[9],
-            })
-        return jsonify({"claims": claims}), 200
+            }
+            for r in rows
+        ]
+    return jsonify({"claims": claims}), 200
 
 
 @app.route('/api/clan_bounty_claims/decision', methods=['POST'])
@@ -5266,52 +5897,39 @@ def decide_clan_bounty_claim() -> Tuple[Any, int]:
         leader = _get_user(conn, username)
         if leader is None:
             return jsonify({"error": "user not found"}), 404
-        # Load claim and clan
-        r = conn.execute('SELECT bounty_id, clan_id, requested_by_user_id, status FROM clan_bounty_claims WHERE id = ?', (claim_id,)).fetchone()
+        # Load claim, its clan's leader and the requester's username together
+        r = conn.execute(
+            'SELECT cbc.bounty_id, cbc.clan_id, cbc.requested_by_user_id, cbc.status, c.leader_user_id, ru.username '
+            'FROM clan_bounty_claims cbc '
+            'LEFT JOIN clans c ON c.id = cbc.clan_id '
+            'LEFT JOIN users ru ON ru.id = cbc.requested_by_user_id '
+            'WHERE cbc.id = ?',
+            (claim_id,)
+        ).fetchone()
         if r is None:
             return jsonify({"error": "claim not found"}), 404
         bounty_id, clan_id, requested_by_user_id, status = int(r[0]), int(r[1]), int(r[2]), (r[3] or '').lower()
         if status != 'pending':
             return jsonify({"error": "claim already decided"}), 400
         # Verify current user is the leader of this clan
-        is_leader = conn.execute('SELECT 1 FROM clans WHERE id = ? AND leader_user_id = ?', (clan_id, leader["id"] if isinstance(leader, dict) else leader[0])).fetchone()
-        if is_leader is None:
+        if r[4] is None or int(r[4]) != int(leader["id"]):
             return jsonify({"error": "forbidden"}), 403
         new_status = 'approved' if decision == 'approve' else 'rejected'
         conn.execute(
             'UPDATE clan_bounty_claims SET status = ?, decided_by_user_id = ?, decided_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-            (new_status, leader["id"] if isinstance(leader, dict) else leader[0], claim_id)
+            (new_status, leader["id"], claim_id)
         )
+        conn.commit()
         # Notify requester
-        req_user_row = conn.execute('SELECT username FROM users WHERE id = ?', (requested_by_user_id,)).fetchone()
-        if req_user_row:
-            req_username = req_user_row[0]
-            # Persist notification with context_bounty_id
-            conn.execute(
-                'INSERT INTO notifications (user_id, type, title, message, payload, context_bounty_id) VALUES (?, ?, ?, ?, ?, ?)',
-                (
-                    requested_by_user_id,
-                    'CLAN_BOUNTY_DECISION',
-                    'Clan bounty request updated',
-                    f'Your clan bounty request was {new_status} for bounty #{bounty_id}',
-                    json.dumps({"decision": new_status, "bounty_id": bounty_id, "claim_id": claim_id}),
-                    bounty_id
-                )
+        req_username = r[5]
+        if req_username:
+            # Persisted (with context_bounty_id) and pushed off the request path, after the decision has committed
+            enqueue_notification(
+                requested_by_user_id, req_username, 'CLAN_BOUNTY_DECISION', 'Clan bounty request updated',
+                f'Your clan bounty request was {new_status} for bounty #{bounty_id}',
+                {"decision": new_status, "bounty_id": bounty_id, "claim_id": claim_id},
+                context_bounty_id=bounty_id,
             )
-            conn.commit()
-            try:
-                notify_user(req_username, {
-                    "id": None,
-                    "type": "CLAN_BOUNTY_DECISION",
-                    "title": "Clan bounty request updated",
-                    "message": f"Your clan bounty request was {new_status} for bounty #{bounty_id}",
-                    "payload": {"decision": new_status, "bounty_id": bounty_id, "claim_id": claim_id},
-                    "context_bounty_id": bounty_id,
-                    "created_at": time.strftime('%Y-%m-%d %H:%M:%S')
-                })
-            except Exception:
-                pass
-        conn.commit()
         return jsonify({"status": new_status}), 200
 
 @app.route('/api/clan_chat', methods=['GET'])
@@ -5326,6 +5944,13 @@ def get_clan_chat():
         clan_id_int = int(clan_id)
     except Exception:
         return jsonify({"error": "invalid clan_id"}), 400
+    # Newest page by default; pass the oldest id you have as before_id to page back through history
+    try:
+        before_id = int(request.args.get('before_id', '0'))
+        limit = int(request.args.get('limit', str(CLAN_CHAT_PAGE_SIZE)))
+    except Exception:
+        return jsonify({"error": "invalid before_id or limit"}), 400
+    limit = max(1, min(limit, 500))
     with get_db_connection() as conn:
         u = _get_user(conn, username)
         if u is None:
@@ -5333,20 +5958,34 @@ def get_clan_chat():
         mem = conn.execute('SELECT 1 FROM clan_members WHERE clan_id = ? AND user_id = ?', (clan_id_int, u["id"]))
         if mem.fetchone() is None:
             return jsonify({"error": "not a member"}), 403
-        msgs = conn.execute(
-            'SELECT m.id, m.message, m.created_at, u.username as sender_username FROM clan_messages m JOIN users u ON u.id = m.sender_user_id WHERE m.clan_id = ? AND m.deleted_at IS NULL ORDER BY m.created_at ASC',
+        # Chat changes only by new messages (max id) or deletions (count); clients must revalidate every poll
+        version = tuple(conn.execute(
+            'SELECT MAX(id), COUNT(*) FROM clan_messages WHERE clan_id = ? AND deleted_at IS NULL',
             (clan_id_int,)
+        ).fetchone())
+        etag = _etag('clan_chat', clan_id_int, before_id, limit, *version)
+        if request.if_none_match.contains(etag):
+            return _etagged_json(etag, None, cache_control='private, no-cache')
+        # Only the default newest page is what every member polls, so it is the only one cached
+        cacheable = before_id == 0 and limit == CLAN_CHAT_PAGE_SIZE
+        cached = _clan_chat_cache.get(clan_id_int) if cacheable else None
+        if cached is not None and cached[0] == version:
+            return _etagged_json(etag, cached[1], cache_control='private, no-cache')
+        # Backward range scan on idx_cm_live_id; the page is then flipped back to oldest-first display order
+        msgs = conn.execute(
+            'SELECT m.id, m.message, m.created_at, u.username as sender_username FROM clan_messages m JOIN users u ON u.id = m.sender_user_id '
+            'WHERE m.clan_id = ? AND m.deleted_at IS NULL AND (? = 0 OR m.id < ?) ORDER BY m.id DESC LIMIT ?',
+            (clan_id_int, before_id, before_id, limit)
         ).fetchall()
         messages = [
-            {
-                "id": r["id"],
-                "sender_username": r["sender_username"],
-                "message": r["message"],
-                "created_at": r["created_at"],
-            }
-            for r in msgs
+            {"id": r["id"], "sender_username": r["sender_username"], "message": r["message"], "created_at": r["created_at"]}
+            for r in reversed(msgs)
         ]
-        return jsonify({"messages": messages}), 200
+        body = _json_dumps_bytes({"messages": messages}, sort_keys=True)
+        if cacheable:
+            # Tagged with the version read above, so another worker's newer message is never masked by this entry
+            _clan_chat_cache.set(clan_id_int, (version, body))
+        return _etagged_json(etag, body, cache_control='private, no-cache')
 
 
 @app.route('/api/clan_chat', methods=['POST'])
@@ -5359,7 +5998,7 @@ def post_clan_chat():
         clan_id = int(data.get('clan_id'))
     except Exception:
         return jsonify({"error": "invalid clan_id"}), 400
-    message_text = (data.get('message') or '').trim() if hasattr((data.get('message') or ''), 'trim') else (data.get('message') or '').strip()
+    message_text = (data.get('message') or '').strip()
     if not message_text:
         return jsonify({"error": "message required"}), 400
     with get_db_connection() as conn:
@@ -5369,10 +6008,12 @@ def post_clan_chat():
         mem = conn.execute('SELECT 1 FROM clan_members WHERE clan_id = ? AND user_id = ?', (clan_id, u["id"]))
         if mem.fetchone() is None:
             return jsonify({"error": "not a member"}), 403
-        conn.execute('INSERT INTO clan_messages (clan_id, sender_user_id, message) VALUES (?, ?, ?)', (clan_id, u["id"], message_text))
-        msg_row_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
-        msg_row = conn.execute('SELECT id, message, created_at FROM clan_messages WHERE id = ?', (msg_row_id,)).fetchone()
+        msg_row = conn.execute(
+            'INSERT INTO clan_messages (clan_id, sender_user_id, message) VALUES (?, ?, ?) RETURNING id, message, created_at',
+            (clan_id, u["id"], message_text)
+        ).fetchone()
         conn.commit()
+        _clan_chat_cache.pop(clan_id)
         return jsonify({
             "message": {
                 "id": msg_row["id"],
@@ -5403,15 +6044,48 @@ def delete_clan_message(message_id: int):
             return jsonify({"error": "forbidden"}), 403
         conn.execute('UPDATE clan_messages SET deleted_at = CURRENT_TIMESTAMP, deleted_by_user_id = ? WHERE id = ?', (u["id"], message_id))
         conn.commit()
+        _clan_chat_cache.pop(clan_id)
         return jsonify({"status": "deleted"}), 200
 
 
 # ======== Leaderboard ========
+CLAN_LEADERBOARD_REFRESH_SECONDS = int(os.environ.get('CLAN_LEADERBOARD_REFRESH_SECONDS', '60'))
+
+
+def refresh_clan_leaderboard() -> None:
+    """Rebuild clan_leaderboard_cache from current clan membership and points in one transaction."""
+    try:
+        with get_db_connection() as conn:
+            conn.execute('DELETE FROM clan_leaderboard_cache')
+            conn.execute(
+                'INSERT INTO clan_leaderboard_cache (clan_id, name, city, points, members_count) '
+                'SELECT c.id, c.name, c.city, COALESCE(SUM(u.total_points), 0), COUNT(cm.user_id) '
+                'FROM clans c '
+                'JOIN clan_members cm ON cm.clan_id = c.id '
+                'JOIN users u ON u.id = cm.user_id '
+                'GROUP BY c.id'
+            )
+            conn.commit()
+    except Exception as e:
+        print(f"Clan leaderboard refresh error: {e}")
+
+
+def _clan_leaderboard_loop() -> None:
+    while True:
+        time.sleep(CLAN_LEADERBOARD_REFRESH_SECONDS)
+        refresh_clan_leaderboard()
+
+
+
 @app.route('/api/leaderboard/users', methods=['GET'])
 def leaderboard_users():
     limit = int(request.args.get('limit', '10'))
     limit = max(1, min(limit, 50))
     with get_db_connection() as conn:
+        users_version = conn.execute('SELECT users_version FROM stats WHERE id = 1').fetchone()[0]
+        etag = _etag('users', users_version, limit)
+        if request.if_none_match.contains(etag):
+            return _etagged_json(etag, None)
         rows = conn.execute('SELECT username, total_points, city, state FROM users ORDER BY total_points DESC LIMIT ?', (limit,)).fetchall()
         users = [
             {
@@ -5422,7 +6096,7 @@ def leaderboard_users():
             }
             for r in rows
         ]
-        return jsonify({"users": users}), 200
+        return _etagged_json(etag, _json_dumps_bytes({"users": users}, sort_keys=True))
 
 
 @app.route('/api/leaderboard/clans', methods=['GET'])
@@ -5430,14 +6104,14 @@ def leaderboard_clans():
     limit = int(request.args.get('limit', '10'))
     limit = max(1, min(limit, 50))
     with get_db_connection() as conn:
+        # The table only changes when refresh_clan_leaderboard rebuilds it
+        refreshed_at = conn.execute('SELECT MAX(updated_at) FROM clan_leaderboard_cache').fetchone()[0]
+        etag = _etag('clans', refreshed_at, limit)
+        if request.if_none_match.contains(etag):
+            return _etagged_json(etag, None)
+        # Served from the materialized table (refreshed every CLAN_LEADERBOARD_REFRESH_SECONDS)
         rows = conn.execute(
-            'SELECT c.id, c.name, c.city, SUM(u.total_points) AS points, COUNT(cm.user_id) AS members_count '
-            'FROM clans c '
-            'JOIN clan_members cm ON cm.clan_id = c.id '
-            'JOIN users u ON u.id = cm.user_id '
-            'GROUP BY c.id '
-            'ORDER BY points DESC '
-            'LIMIT ?',
+            'SELECT clan_id AS id, name, city, points, members_count FROM clan_leaderboard_cache ORDER BY points DESC LIMIT ?',
             (limit,)
         ).fetchall()
         clans = [
@@ -5450,7 +6124,7 @@ def leaderboard_clans():
             }
             for r in rows
         ]
-        return jsonify({"clans": clans}), 200
+        return _etagged_json(etag, _json_dumps_bytes({"clans": clans}, sort_keys=True))
 
 
 @app.route('/api/leaderboard/city_co2', methods=['GET'])
@@ -5465,14 +6139,17 @@ def leaderboard_city_co2():
     username = parse_username_from_auth()
     if not username:
         return jsonify({"error": "unauthorized"}), 401
-    week_ago = (datetime.utcnow() - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
     with get_db_connection() as conn:
-        u = conn.execute('SELECT id, city FROM users WHERE username = ?', (username,)).fetchone()
+        u = _get_user(conn, username)
         if not u:
             return jsonify({"error": "user not found"}), 404
-        city = u[1]
+        city = u["city"]
         if not city:
             return jsonify({"users": []}), 200
+        cached = _city_co2_cache.get((city, limit))
+        if cached is not None:
+            return _etagged_json(_etag(cached), cached)
+        week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat(sep=' ', timespec='seconds')
         rows = conn.execute(
             'SELECT users.username AS username, users.city AS city, '
             'COALESCE(SUM(carbon_events.amount_kg), 0) AS saved_kg '
@@ -5489,15 +6166,12 @@ def leaderboard_city_co2():
             {"username": r[0], "city": r[1], "saved_kg": round(float(r[2] or 0.0), 3)}
             for r in rows
         ]
-        return jsonify({"users": users, "city": city}), 200
+        body = _json_dumps_bytes({"users": users, "city": city}, sort_keys=True)
+        _city_co2_cache.set((city, limit), body)
+        return _etagged_json(_etag(body), body)
 
 
 # ======== Friends & Direct Messages ========
-def _get_user_id(conn: Connection, username: str) -> Optional[int]:
-    row = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
-    return int(row[0]) if row else None
-
-
 def _normalize_pair(a_id: int, b_id: int) -> Tuple[int, int]:
     return (a_id, b_id) if a_id < b_id else (b_id, a_id)
 
@@ -5517,44 +6191,30 @@ def get_user_profile() -> Tuple[Any, int]:
     if not viewer:
         return jsonify({"error": "unauthorized"}), 401
     with get_db_connection() as conn:
+        # User, lifetime counters (trigger-maintained) and clan in one statement
         u = conn.execute(
-            'SELECT id, username, total_points, country, state, city FROM users WHERE username = ?',
+            'SELECT u.id, u.username, u.total_points, u.country, u.state, u.city, '
+            '       u.lifetime_spent AS spent, u.lifetime_detections AS detections, u.lifetime_bounties AS claimed_bounties, '
+            '       c.id AS clan_id, c.name AS clan_name, cm.role AS clan_role '
+            'FROM users u '
+            'LEFT JOIN clan_members cm ON cm.user_id = u.id '
+            'LEFT JOIN clans c ON c.id = cm.clan_id '
+            'WHERE u.username = ?',
             (target_username,)
         ).fetchone()
         if u is None:
             return jsonify({"error": "user not found"}), 404
-        uid = int(u[0])
         total_now = int(u[2])
         # Lifetime points = current + total spent
-        spent_row = conn.execute(
-            'SELECT COALESCE(SUM(CASE WHEN points_change < 0 THEN -points_change ELSE 0 END),0) FROM transactions WHERE user_id = ?',
-            (uid,)
-        ).fetchone()
-        spent_points = int(spent_row[0]) if spent_row else 0
-        lifetime_points = total_now + spent_points
-        # Lifetime detections from reasons that represent detections
-        det_row = conn.execute(
-            'SELECT COUNT(*) FROM transactions WHERE user_id = ? AND points_change > 0 AND reason IN ("Waste Detected", "Video Disposal Verified")',
-            (uid,)
-        ).fetchone()
-        lifetime_detections = int(det_row[0]) if det_row else 0
-        # Lifetime claimed bounties
-        cb_row = conn.execute(
-            'SELECT COUNT(*) FROM waste_bounty WHERE claimed_by_user_id = ?',
-            (uid,)
-        ).fetchone()
-        lifetime_claimed_bounties = int(cb_row[0]) if cb_row else 0
-        # Clan info
-        clan_row = conn.execute(
-            'SELECT c.id, c.name, cm.role FROM clan_members cm JOIN clans c ON c.id = cm.clan_id WHERE cm.user_id = ?',
-            (uid,)
-        ).fetchone()
+        lifetime_points = total_now + int(u["spent"] or 0)
+        lifetime_detections = int(u["detections"] or 0)
+        lifetime_claimed_bounties = int(u["claimed_bounties"] or 0)
         clan = None
-        if clan_row:
+        if u["clan_id"] is not None:
             clan = {
-                "id": clan_row[0],
-                "name": clan_row[1],
-                "role": clan_row[2],
+                "id": u["clan_id"],
+                "name": u["clan_name"],
+                "role": u["clan_role"],
             }
         return jsonify({
             "username": u[1],
@@ -5577,28 +6237,24 @@ def list_friends():
         if me is None:
             return jsonify({"error": "user not found"}), 404
         uid = me["id"]
-        # Accepted friends
+        # Accepted friends and pending requests in both directions in one pass; kind buckets them
         rows = conn.execute(
-            'SELECT f.user_a_id, f.user_b_id, u.username AS other_username '\
-            'FROM friends f JOIN users u ON (u.id = CASE WHEN f.user_a_id = ? THEN f.user_b_id ELSE f.user_a_id END) '\
-            'WHERE (f.user_a_id = ? OR f.user_b_id = ?) AND f.status = "accepted"',
-            (uid, uid, uid)
-        ).fetchall()
-        friends = [{"username": r["other_username"]} for r in rows]
-        # Incoming pending
-        rows_in = conn.execute(
-            'SELECT u.username FROM friends f JOIN users u ON u.id = CASE WHEN f.user_a_id = ? THEN f.user_b_id ELSE f.user_a_id END '
-            'WHERE (f.user_a_id = ? OR f.user_b_id = ?) AND f.status = "pending" AND f.requested_by_user_id <> ?',
+            'SELECT CASE WHEN f.status = "accepted" THEN "a" WHEN f.requested_by_user_id = ? THEN "o" ELSE "i" END AS kind, '
+            '       u.username '
+            'FROM friends f JOIN users u ON u.id = CASE WHEN f.user_a_id = ? THEN f.user_b_id ELSE f.user_a_id END '
+            'WHERE (f.user_a_id = ? OR f.user_b_id = ?) AND f.status IN ("accepted", "pending")',
             (uid, uid, uid, uid)
-        ).fetchall()
-        pending_incoming = [r[0] for r in rows_in]
-        # Outgoing pending
-        rows_out = conn.execute(
-            'SELECT u.username FROM friends f JOIN users u ON u.id = CASE WHEN f.user_a_id = ? THEN f.user_b_id ELSE f.user_a_id END '
-            'WHERE (f.user_a_id = ? OR f.user_b_id = ?) AND f.status = "pending" AND f.requested_by_user_id = ?',
-            (uid, uid, uid, uid)
-        ).fetchall()
-        pending_outgoing = [r[0] for r in rows_out]
+        )
+        friends: List[Dict[str, Any]] = []
+        pending_incoming: List[str] = []
+        pending_outgoing: List[str] = []
+        for kind, other in rows:
+            if kind == 'a':
+                friends.append({"username": other})
+            elif kind == 'o':
+                pending_outgoing.append(other)
+            else:
+                pending_incoming.append(other)
         return jsonify({"friends": friends, "pending_incoming": pending_incoming, "pending_outgoing": pending_outgoing}), 200
 
 
@@ -5614,61 +6270,62 @@ def add_friend():
     if target == username:
         return jsonify({"error": "cannot add yourself"}), 400
     with get_db_connection() as conn:
-        me_id = _get_user_id(conn, username)
-        you_id = _get_user_id(conn, target)
+        ids = _get_user_ids(conn, (username, target))
+        me_id, you_id = ids.get(username), ids.get(target)
         if me_id is None or you_id is None:
             return jsonify({"error": "user not found"}), 404
         a_id, b_id = _normalize_pair(me_id, you_id)
-        pair = conn.execute('SELECT id, status, requested_by_user_id FROM friends WHERE user_a_id = ? AND user_b_id = ?', (a_id, b_id)).fetchone()
+        # Hold the write lock from the upsert through the notification write (one commit)
+        conn.execute('BEGIN IMMEDIATE')
+        # New pair -> inserted as pending; their pending request to you -> accepted. Any other existing
+        # pair is left untouched, and RETURNING yields no row.
+        pair = conn.execute(
+            'INSERT INTO friends (user_a_id, user_b_id, status, requested_by_user_id, updated_at) VALUES (?, ?, "pending", ?, CURRENT_TIMESTAMP) '
+            'ON CONFLICT(user_a_id, user_b_id) DO UPDATE SET status = "accepted", updated_at = CURRENT_TIMESTAMP '
+            'WHERE friends.status = "pending" AND friends.requested_by_user_id <> excluded.requested_by_user_id '
+            'RETURNING status',
+            (a_id, b_id, me_id)
+        ).fetchone()
         if pair is None:
-            conn.execute('INSERT INTO friends (user_a_id, user_b_id, status, requested_by_user_id, updated_at) VALUES (?, ?, "pending", ?, CURRENT_TIMESTAMP)', (a_id, b_id, me_id))
+            row = conn.execute('SELECT status FROM friends WHERE user_a_id = ? AND user_b_id = ?', (a_id, b_id)).fetchone()
+            return jsonify({"status": (row["status"] or '').lower()}), 200
+        if pair["status"] == 'pending':
             # persist + notify recipient
             try:
-                you_row = conn.execute('SELECT id FROM users WHERE username = ?', (target,)).fetchone()
-                if you_row:
-                    conn.execute(
-                        'INSERT INTO notifications (user_id, type, title, message, payload) VALUES (?, ?, ?, ?, ?)',
-                        (int(you_row[0]), 'FRIEND_REQUEST', 'New friend request', f'@{username} sent you a friend request', json.dumps({"from": username}))
-                    )
+                n_row = conn.execute(
+                    'INSERT INTO notifications (user_id, type, title, message, payload) VALUES (?, ?, ?, ?, ?) RETURNING id, created_at',
+                    (you_id, 'FRIEND_REQUEST', 'New friend request', f'@{username} sent you a friend request', _json_dumps({"from": username}))
+                ).fetchone()
                 conn.commit()
                 notify_user(target, {
-                    "id": None,
+                    "id": n_row[0],
                     "type": "FRIEND_REQUEST",
                     "title": "New friend request",
                     "message": f"@{username} sent you a friend request",
                     "payload": {"from": username},
-                    "created_at": time.strftime('%Y-%m-%d %H:%M:%S')
+                    "created_at": n_row[1]
                 })
             except Exception:
                 pass
             return jsonify({"status": "pending"}), 200
-        status = (pair["status"] or '').lower()
-        requested_by = int(pair["requested_by_user_id"])
-        if status == 'accepted':
-            return jsonify({"status": "accepted"}), 200
-        if status == 'pending' and requested_by != me_id:
-            # Auto-accept if they already requested you
-            conn.execute('UPDATE friends SET status = "accepted", updated_at = CURRENT_TIMESTAMP WHERE id = ?', (pair["id"],))
-            try:
-                tgt_row = conn.execute('SELECT id FROM users WHERE username = ?', (target,)).fetchone()
-                if tgt_row:
-                    conn.execute(
-                        'INSERT INTO notifications (user_id, type, title, message, payload) VALUES (?, ?, ?, ?, ?)',
-                        (int(tgt_row[0]), 'FRIEND_ACCEPTED', 'Friend request accepted', f'@{username} accepted your friend request', json.dumps({"user": username}))
-                    )
-                conn.commit()
-                notify_user(target, {
-                    "id": None,
-                    "type": "FRIEND_ACCEPTED",
-                    "title": "Friend request accepted",
-                    "message": f"@{username} accepted your friend request",
-                    "payload": {"user": username},
-                    "created_at": time.strftime('%Y-%m-%d %H:%M:%S')
-                })
-            except Exception:
-                pass
-            return jsonify({"status": "accepted"}), 200
-        return jsonify({"status": status}), 200
+        # Auto-accepted: they had already requested you
+        try:
+            n_row = conn.execute(
+                'INSERT INTO notifications (user_id, type, title, message, payload) VALUES (?, ?, ?, ?, ?) RETURNING id, created_at',
+                (you_id, 'FRIEND_ACCEPTED', 'Friend request accepted', f'@{username} accepted your friend request', _json_dumps({"user": username}))
+            ).fetchone()
+            conn.commit()
+            notify_user(target, {
+                "id": n_row[0],
+                "type": "FRIEND_ACCEPTED",
+                "title": "Friend request accepted",
+                "message": f"@{username} accepted your friend request",
+                "payload": {"user": username},
+                "created_at": n_row[1]
+            })
+        except Exception:
+            pass
+        return jsonify({"status": "accepted"}), 200
 
 
 @app.route('/api/friends/decision', methods=['POST'])
@@ -5682,11 +6339,13 @@ def decide_friend():
     if decision not in ('accept', 'reject'):
         return jsonify({"error": "decision must be accept or reject"}), 400
     with get_db_connection() as conn:
-        me_id = _get_user_id(conn, username)
-        you_id = _get_user_id(conn, target)
+        ids = _get_user_ids(conn, (username, target))
+        me_id, you_id = ids.get(username), ids.get(target)
         if me_id is None or you_id is None:
             return jsonify({"error": "user not found"}), 404
         a_id, b_id = _normalize_pair(me_id, you_id)
+        # Hold the write lock from the pair read through the friend + notification writes (one commit)
+        conn.execute('BEGIN IMMEDIATE')
         pair = conn.execute('SELECT id, status FROM friends WHERE user_a_id = ? AND user_b_id = ?', (a_id, b_id)).fetchone()
         if pair is None:
             return jsonify({"error": "no request found"}), 404
@@ -5696,20 +6355,18 @@ def decide_friend():
         if decision == 'accept':
             conn.execute('UPDATE friends SET status = "accepted", updated_at = CURRENT_TIMESTAMP WHERE id = ?', (pair["id"],))
             try:
-                tgt_row = conn.execute('SELECT id FROM users WHERE username = ?', (target,)).fetchone()
-                if tgt_row:
-                    conn.execute(
-                        'INSERT INTO notifications (user_id, type, title, message, payload) VALUES (?, ?, ?, ?, ?)',
-                        (int(tgt_row[0]), 'FRIEND_ACCEPTED', 'Friend request accepted', f'@{username} accepted your friend request', json.dumps({"user": username}))
-                    )
+                n_row = conn.execute(
+                    'INSERT INTO notifications (user_id, type, title, message, payload) VALUES (?, ?, ?, ?, ?) RETURNING id, created_at',
+                    (you_id, 'FRIEND_ACCEPTED', 'Friend request accepted', f'@{username} accepted your friend request', _json_dumps({"user": username}))
+                ).fetchone()
                 conn.commit()
                 notify_user(target, {
-                    "id": None,
+                    "id": n_row[0],
                     "type": "FRIEND_ACCEPTED",
                     "title": "Friend request accepted",
                     "message": f"@{username} accepted your friend request",
                     "payload": {"user": username},
-                    "created_at": time.strftime('%Y-%m-%d %H:%M:%S')
+                    "created_at": n_row[1]
                 })
             except Exception:
                 pass
@@ -5731,8 +6388,8 @@ def get_direct_messages():
     if not with_user:
         return jsonify({"error": "with is required"}), 400
     with get_db_connection() as conn:
-        me_id = _get_user_id(conn, username)
-        you_id = _get_user_id(conn, with_user)
+        ids = _get_user_ids(conn, (username, with_user))
+        me_id, you_id = ids.get(username), ids.get(with_user)
         if me_id is None or you_id is None:
             return jsonify({"error": "user not found"}), 404
         # Require accepted friendship
@@ -5740,26 +6397,28 @@ def get_direct_messages():
         pair = conn.execute('SELECT status FROM friends WHERE user_a_id = ? AND user_b_id = ?', (a_id, b_id)).fetchone()
         if pair is None or (pair["status"] or '').lower() != 'accepted':
             return jsonify({"error": "not friends"}), 403
+        # One idx_dm_pair_live range per direction instead of an OR the planner can't seek on. Each half
+        # stops after `limit` rows in id order (the index order), so at most 2 * limit rows reach the final sort.
         rows = conn.execute(
             'SELECT m.id, s.username as sender_username, r.username as recipient_username, m.message, m.created_at '
-            'FROM direct_messages m '
+            'FROM ('
+            '  SELECT * FROM ('
+            '    SELECT id, sender_user_id, recipient_user_id, message, created_at FROM direct_messages '
+            '    WHERE sender_user_id = ? AND recipient_user_id = ? AND deleted_at IS NULL ORDER BY id ASC LIMIT ?'
+            '  ) '
+            '  UNION ALL '
+            '  SELECT * FROM ('
+            '    SELECT id, sender_user_id, recipient_user_id, message, created_at FROM direct_messages '
+            '    WHERE sender_user_id = ? AND recipient_user_id = ? AND deleted_at IS NULL ORDER BY id ASC LIMIT ?'
+            '  )'
+            ') m '
             'JOIN users s ON s.id = m.sender_user_id '
             'JOIN users r ON r.id = m.recipient_user_id '
-            'WHERE ((m.sender_user_id = ? AND m.recipient_user_id = ?) OR (m.sender_user_id = ? AND m.recipient_user_id = ?)) '
-            '  AND m.deleted_at IS NULL '
             'ORDER BY m.id ASC LIMIT ?',
-            (me_id, you_id, you_id, me_id, limit)
-        ).fetchall()
-        messages = [
-            {
-                "id": r["id"],
-                "sender_username": r["sender_username"],
-                "recipient_username": r["recipient_username"],
-                "message": r["message"],
-                "created_at": r["created_at"],
-            } for r in rows
-        ]
-        return jsonify({"messages": messages}), 200
+            (me_id, you_id, limit, you_id, me_id, limit, limit)
+        )
+        messages = list(_iter_row_dicts(rows, ("id", "sender_username", "recipient_username", "message", "created_at")))
+    return jsonify({"messages": messages}), 200
 
 
 @app.route('/api/dm', methods=['POST'])
@@ -5775,17 +6434,18 @@ def send_direct_message():
     if len(text) > 2000:
         return jsonify({"error": "message too long"}), 400
     with get_db_connection() as conn:
-        me_id = _get_user_id(conn, username)
-        you_id = _get_user_id(conn, to_user)
+        ids = _get_user_ids(conn, (username, to_user))
+        me_id, you_id = ids.get(username), ids.get(to_user)
         if me_id is None or you_id is None:
             return jsonify({"error": "user not found"}), 404
         a_id, b_id = _normalize_pair(me_id, you_id)
         pair = conn.execute('SELECT status FROM friends WHERE user_a_id = ? AND user_b_id = ?', (a_id, b_id)).fetchone()
         if pair is None or (pair["status"] or '').lower() != 'accepted':
             return jsonify({"error": "not friends"}), 403
-        conn.execute('INSERT INTO direct_messages (sender_user_id, recipient_user_id, message) VALUES (?, ?, ?)', (me_id, you_id, text))
-        msg_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
-        row = conn.execute('SELECT id, created_at FROM direct_messages WHERE id = ?', (msg_id,)).fetchone()
+        row = conn.execute(
+            'INSERT INTO direct_messages (sender_user_id, recipient_user_id, message) VALUES (?, ?, ?) RETURNING id, created_at',
+            (me_id, you_id, text)
+        ).fetchone()
         conn.commit()
         created = {
             "id": row["id"],
@@ -5794,17 +6454,14 @@ def send_direct_message():
             "message": text,
             "created_at": row["created_at"],
         }
-        try:
-            notify_user(to_user, {
-                "id": None,
-                "type": "DM",
-                "title": f"Message from @{username}",
-                "message": text[:80],
-                "payload": {"from": username},
-                "created_at": time.strftime('%Y-%m-%d %H:%M:%S')
-            })
-        except Exception:
-            pass
+        notify_user(to_user, {
+            "id": None,
+            "type": "DM",
+            "title": f"Message from @{username}",
+            "message": text[:80],
+            "payload": {"from": username},
+            "created_at": time.strftime('%Y-%m-%d %H:%M:%S')
+        })
         return jsonify({"message": created}), 201
 
 
@@ -5824,6 +6481,35 @@ def delete_direct_message(message_id: int):
         conn.commit()
         return jsonify({"status": "deleted"}), 200
 
+
+_background_workers_started = False
+
+
+def start_background_workers() -> None:
+    """
+    Prefill the DB pool and start this process's scheduler, notification and clan leaderboard threads.
+    Runs at import, or from gunicorn's post_fork hook in the worker (see gunicorn.conf.py).
+    """
+    global _background_workers_started
+    if _background_workers_started:
+        return
+    _background_workers_started = True
+    try:
+        _prefill_db_pool(DB_POOL_PREFILL)
+    except Exception as e:
+        print(f"DB pool prefill failed: {e}")
+    refresh_clan_leaderboard()
+    for target in (_scheduler_loop, _notification_worker, _clan_leaderboard_loop):
+        threading.Thread(target=target, daemon=True).start()
+
+
+# gunicorn.conf.py sets this to 0 so the preloading master never holds SQLite handles or threads when it forks
+if os.environ.get('START_BACKGROUND_WORKERS', '1') == '1':
+    start_background_workers()
+else:
+    # Close the connection init_db returned to the pool; each worker opens its own after the fork
+    _close_db_pool()
+
 if __name__ == '__main__':
     init_db()
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,30 @@
+# Production server settings; run from backend/ with: gunicorn -c gunicorn.conf.py app:app
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Import the app (OpenCV, schema setup, detection config) once in the master and share it copy-on-write.
+# The master must not fork while holding SQLite handles or running threads (their locks would be inherited
+# mid-use), so app.py skips its pool prefill and background threads at import and the worker starts them.
+preload_app = True
+os.environ['START_BACKGROUND_WORKERS'] = '0'
+
+# Exactly one worker process: SSE subscribers (notification_subscribers) and every _TTLCache eviction live in
+# process memory, so a second worker would miss live pushes and serve caches another worker already invalidated.
+workers = 1
+# Each open SSE stream (one per dashboard) holds a thread for as long as it is connected; size this for
+# concurrent dashboards plus headroom for API calls waiting on Gemini or video processing
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '64'))
+
+# No periodic recycling: with a single worker, a max_requests restart would stop accepting until every open
+# SSE stream hit graceful_timeout
+max_requests = 0
+
+timeout = 60
+graceful_timeout = 30
+
+
+def post_fork(server, worker):
+    import app
+    app.start_background_workers()